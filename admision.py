@@ -0,0 +1,250 @@
+import os
+import json
+import math
+import time
+import threading
+from datetime import datetime
+from functools import wraps
+
+from flask import current_app, jsonify, session
+
+# Control de admisión de las rutas de enmarcado.
+# Antes de leer la carga, cada solicitud pasa por:
+#   1. el horario de servicio (ADMISION_HORARIO; vacío = siempre abierto),
+#   2. el límite de renders en vuelo del usuario (según su rol) y del proceso,
+#   3. la cubeta de fichas del usuario (tasa y ráfaga según su rol) y la global.
+# Si algo no alcanza se responde 429 con Retry-After en el acto, sin encolar la
+# solicitud: un usuario que inunda la ruta no retrasa a los demás.
+# Un lote paga una ficha al entrar y el resto (una por acta) al conocer sus
+# archivos (cobrar): la cubeta del usuario puede quedar en negativo y sus
+# siguientes solicitudes esperan a que se reponga. Así un lote no sirve para
+# saltarse la tasa por rol.
+# Las cubetas y los contadores son del proceso; con varios workers cada uno
+# aplica los límites por su cuenta.
+
+# Límites por rol: `tasa` solicitudes por segundo sostenidas, `rafaga` seguidas y
+# `en_vuelo` renders simultáneos. ADMISION_LIMITES (JSON) cambia o agrega roles,
+# p. ej. '{"cliente": {"tasa": 2}, "mayorista": {"tasa": 10, "rafaga": 50, "en_vuelo": 4}}'
+LIMITES_POR_ROL = {
+    "cliente": {"tasa": 1.0, "rafaga": 10, "en_vuelo": 2},
+    "admin": {"tasa": 5.0, "rafaga": 30, "en_vuelo": 4},
+}
+ROL_PREDETERMINADO = "cliente"
+for _rol, _limites in json.loads(os.getenv("ADMISION_LIMITES", "{}")).items():
+    LIMITES_POR_ROL.setdefault(_rol, dict(LIMITES_POR_ROL[ROL_PREDETERMINADO])).update(_limites)
+
+GLOBAL_TASA = float(os.getenv("ADMISION_GLOBAL_TASA", "40"))  # Solicitudes por segundo de todo el proceso
+GLOBAL_RAFAGA = float(os.getenv("ADMISION_GLOBAL_RAFAGA", "80"))
+EN_VUELO_PROCESO = int(os.getenv("ADMISION_EN_VUELO_PROCESO", "8"))  # Renders simultáneos del proceso
+REINTENTO_EN_VUELO = 1  # Retry-After (s) cuando el rechazo es por renders en vuelo
+MAX_USUARIOS = 10000  # Usuarios con estado en memoria antes de purgar los inactivos
+# Horario de servicio en hora de México, "HH:MM-HH:MM" (vacío: todo el día)
+HORARIO = os.getenv("ADMISION_HORARIO", "")
+
+MENSAJES = {
+    "en_vuelo_usuario": "Ya tienes demasiados PDFs en proceso, espera a que terminen.",
+    "en_vuelo_proceso": "El servicio está ocupado, intenta de nuevo en un momento.",
+    "tasa_usuario": "Demasiadas solicitudes, intenta de nuevo en unos segundos.",
+    "tasa_global": "El servicio está ocupado, intenta de nuevo en un momento.",
+}
+
+
+def _leer_horario(texto):
+    if not texto:
+        return None
+    inicio, fin = texto.split("-")
+    return tuple(datetime.strptime(hora.strip(), "%H:%M").time() for hora in (inicio, fin))
+
+
+_horario = _leer_horario(HORARIO)
+_zona = None
+
+
+def dentro_de_horario():
+    """True si la hora actual de México está dentro de ADMISION_HORARIO (o no hay horario)."""
+    global _zona
+    if _horario is None:
+        return True
+    if _zona is None:
+        import pytz  # ~30 ms con sus datos: solo se carga si hay horario
+        _zona = pytz.timezone('America/Mexico_City')
+    ahora = datetime.now(_zona).time()
+    return _horario[0] <= ahora <= _horario[1]
+
+
+class CubetaFichas:
+    """Cubeta de fichas que se rellena a `tasa` por segundo hasta `capacidad`."""
+
+    __slots__ = ("tasa", "capacidad", "fichas", "actualizada")
+
+    def __init__(self, tasa, capacidad, ahora):
+        self.tasa = tasa
+        self.capacidad = capacidad
+        self.fichas = capacidad
+        self.actualizada = ahora
+
+    def rellenar(self, ahora):
+        self.fichas = min(self.capacidad, self.fichas + (ahora - self.actualizada) * self.tasa)
+        self.actualizada = ahora
+
+    def espera(self, ahora, costo=1):
+        """Segundos hasta tener `costo` fichas (0 si ya las hay)."""
+        self.rellenar(ahora)
+        faltan = costo - self.fichas
+        if faltan <= 0:
+            return 0.0
+        return faltan / self.tasa if self.tasa > 0 else math.inf
+
+    def tomar(self, costo=1):
+        self.fichas -= costo
+
+
+class _EstadoUsuario:
+    __slots__ = ("cubeta", "en_vuelo")
+
+    def __init__(self, cubeta):
+        self.cubeta = cubeta
+        self.en_vuelo = 0
+
+
+class ControlAdmision:
+    """Cubetas por usuario y global, renders en vuelo y contadores de admisión."""
+
+    def __init__(self, global_tasa=GLOBAL_TASA, global_rafaga=GLOBAL_RAFAGA, en_vuelo_proceso=EN_VUELO_PROCESO):
+        self.en_vuelo_proceso = en_vuelo_proceso
+        self._global = CubetaFichas(global_tasa, global_rafaga, time.monotonic())
+        self._usuarios = {}
+        self._en_vuelo = 0
+        self._purgado = 0.0
+        self._lock = threading.Lock()
+        self._contadores = {"admitidas": 0, **{motivo: 0 for motivo in MENSAJES}}
+
+    def admitir(self, user_id, rol, en_vuelo=True, costo=1):
+        """Admite la solicitud o explica el rechazo: (None, 0) o (motivo, segundos para reintentar).
+
+        `costo` son las fichas que consume de las cubetas (una vista previa, una fracción).
+        """
+        limites = LIMITES_POR_ROL.get(rol) or LIMITES_POR_ROL[ROL_PREDETERMINADO]
+        ahora = time.monotonic()
+        with self._lock:
+            usuario = self._usuarios.get(user_id)
+            if usuario is None:
+                # A lo más una purga por segundo: si todos están activos no se recorre en cada alta
+                if len(self._usuarios) >= MAX_USUARIOS and ahora - self._purgado >= 1:
+                    self._purgar(ahora)
+                usuario = self._usuarios[user_id] = _EstadoUsuario(CubetaFichas(limites["tasa"], limites["rafaga"], ahora))
+            # Un cambio de rol aplica en la siguiente solicitud
+            usuario.cubeta.tasa, usuario.cubeta.capacidad = limites["tasa"], limites["rafaga"]
+
+            motivo, espera = None, 0.0
+            if en_vuelo and usuario.en_vuelo >= limites["en_vuelo"]:
+                motivo, espera = "en_vuelo_usuario", REINTENTO_EN_VUELO
+            elif en_vuelo and self._en_vuelo >= self.en_vuelo_proceso:
+                motivo, espera = "en_vuelo_proceso", REINTENTO_EN_VUELO
+            else:
+                espera = usuario.cubeta.espera(ahora, costo)
+                if espera:
+                    motivo = "tasa_usuario"
+                else:
+                    espera = self._global.espera(ahora, costo)
+                    if espera:
+                        motivo = "tasa_global"
+            if motivo is not None:
+                self._contadores[motivo] += 1
+                return motivo, espera
+
+            usuario.cubeta.tomar(costo)
+            self._global.tomar(costo)
+            if en_vuelo:
+                usuario.en_vuelo += 1
+                self._en_vuelo += 1
+            self._contadores["admitidas"] += 1
+            return None, 0.0
+
+    def cobrar(self, user_id, costo):
+        """Descuenta `costo` fichas más de la cubeta del usuario, aunque quede en negativo.
+
+        La cubeta global no se toca: la deuda de un lote grande la paga solo quien lo envió.
+        """
+        if costo <= 0:
+            return
+        with self._lock:
+            usuario = self._usuarios.get(user_id)
+            if usuario is not None:
+                usuario.cubeta.rellenar(time.monotonic())
+                usuario.cubeta.tomar(costo)
+
+    def liberar(self, user_id):
+        """Descuenta un render en vuelo del usuario y del proceso."""
+        with self._lock:
+            usuario = self._usuarios.get(user_id)
+            if usuario is not None:
+                usuario.en_vuelo -= 1
+            self._en_vuelo -= 1
+
+    def _purgar(self, ahora):
+        """Olvida a los usuarios sin renders en vuelo y con la cubeta llena (usar bajo el candado)."""
+        self._purgado = ahora
+        for user_id, usuario in list(self._usuarios.items()):
+            if usuario.en_vuelo == 0 and usuario.cubeta.espera(ahora, usuario.cubeta.capacidad) == 0:
+                del self._usuarios[user_id]
+
+    def estadisticas(self):
+        """Solicitudes admitidas y rechazadas por motivo, renders en vuelo y usuarios en memoria."""
+        with self._lock:
+            return {
+                "resultados": dict(self._contadores),
+                "en_vuelo": self._en_vuelo,
+                "usuarios": len(self._usuarios),
+            }
+
+
+control = ControlAdmision()
+
+
+def _rechazo(mensaje, codigo, espera, respuesta_json):
+    cuerpo = jsonify({"error": mensaje}) if respuesta_json else mensaje
+    encabezados = {'Retry-After': str(max(1, math.ceil(espera)))} if espera else {}
+    return cuerpo, codigo, encabezados
+
+
+def controlar(en_vuelo=True, respuesta_json=False, costo=1):
+    """Decorador de ruta: aplica el horario y el control de admisión antes de leer la carga.
+
+    Con `en_vuelo` la solicitud ocupa un lugar de render hasta que termina su
+    respuesta (incluida la transmisión de un ZIP); `costo` son las fichas que consume.
+    """
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(*args, **kwargs):
+            if not dentro_de_horario():
+                return _rechazo(f"El servicio no está disponible fuera del horario {HORARIO}.", 403, 0, respuesta_json)
+            user_id = session.get('user_id')
+            motivo, espera = control.admitir(user_id, session.get('rol') or ROL_PREDETERMINADO, en_vuelo, costo)
+            if motivo is not None:
+                return _rechazo(MENSAJES[motivo], 429, espera, respuesta_json)
+            if not en_vuelo:
+                return vista(*args, **kwargs)
+            try:
+                respuesta = current_app.make_response(vista(*args, **kwargs))
+            except BaseException:
+                control.liberar(user_id)
+                raise
+            # Un cuerpo que se genera al transmitirse (el ZIP de un lote) sigue ocupando el
+            # lugar hasta que el servidor cierra la respuesta; send_file ya trae el PDF hecho
+            if respuesta.is_streamed and not respuesta.direct_passthrough:
+                respuesta.call_on_close(lambda: control.liberar(user_id))
+            else:
+                control.liberar(user_id)
+            return respuesta
+        return envoltura
+    return decorador
+
+
+def cobrar(costo):
+    """Cobra al usuario de la sesión `costo` fichas más (las actas de un lote después de la primera)."""
+    control.cobrar(session.get('user_id'), costo)
+
+
+def estadisticas():
+    return control.estadisticas()
@@ -1,8 +1,6 @@
 import os
-from flask import Flask, render_template, request, redirect, session, url_for, flash
+from flask import Flask, render_template, request, redirect, session, url_for, flash, jsonify
 from flask_cors import CORS
-from barcode import Code128
-from barcode.writer import ImageWriter
 
 # Decorador de autenticación
 from functools import wraps
@@ -29,18 +27,30 @@ def admin_required(f):
 
 from flask_socketio import SocketIO, emit, disconnect
 from datetime import timedelta
-import mysql.connector
-from enmarcado import enmarcado_bp
+from basedatos import obtener_pool
+from sesiones import obtener_sesion, guardar_sesion, invalidar_sesion, crear_registro
+from enmarcado import enmarcado_bp, warm_up, output_cache, state_cache, preview_cache, preview_uploads
+from codigos import qr_cache_stats
+import admision
+import cargas
+import folios
+import usuarios
+import trabajos
+import metricas
 
 app = Flask(__name__)
 app.secret_key = 'supersecretkey'
+# Las cargas grandes van a un temporal con nombre que PyMuPDF abre sin copiarlo a memoria
+app.request_class = cargas.SolicitudCargas
+app.config['MAX_CONTENT_LENGTH'] = cargas.SOLICITUD_MAX_BYTES  # Límite del cuerpo completo (lotes incluidos)
 app.permanent_session_lifetime = timedelta(days=7)  # Sesión persistente de 7 días
 
 # Configura CORS para permitir orígenes
 CORS(app, resources={r"/*": {"origins": "*"}})
 
 # Inicializa SocketIO con CORS configurado
-socketio = SocketIO(app, async_mode='gevent', cors_allowed_origins="*")  # Puedes reemplazar "*" por tu dominio si es necesario
+# Con varios workers, SOCKETIO_MESSAGE_QUEUE (p. ej. redis://host:6379/0) hace que los emits lleguen a cualquier worker
+socketio = SocketIO(app, async_mode='gevent', cors_allowed_origins="*", message_queue=os.environ.get('SOCKETIO_MESSAGE_QUEUE'))  # Puedes reemplazar "*" por tu dominio si es necesario
 
 
 app.register_blueprint(enmarcado_bp)
@@ -56,28 +66,39 @@ def require_login():
 
 
 def conectar_db():
-    return mysql.connector.connect(
-        host=os.environ.get('MYSQL_HOST'),
-        user=os.environ.get('MYSQL_USER'),
-        password=os.environ.get('MYSQL_PASSWORD'),
-        database=os.environ.get('MYSQL_DATABASE')
-    )
+    # Conexión prestada por el pool; usarla con `with` para que vuelva al pool aunque haya error
+    return obtener_pool().obtener()
     
-# Diccionario para almacenar los tokens de sesión activos en memoria
-active_sessions = {}
+# Registro de sesiones activas (user_id → sid de SocketIO), en memoria o compartido entre workers
+active_sessions = crear_registro()
+
+def notificar_usuario(user_id, evento, datos):
+    """Envía un evento al socket activo del usuario (avance de los trabajos de enmarcado)."""
+    sid = active_sessions.obtener(user_id)
+    if sid:
+        socketio.emit(evento, datos, to=sid)
+
+trabajos.configurar_notificador(notificar_usuario)
 
 @app.route('/')
 def index():
     if 'user_id' not in session:
         return redirect(url_for('login'))
     
-    # Conectar a la base de datos y verificar el rol del usuario
-    conn = conectar_db()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT session_token, activo, rol FROM usuarios WHERE id = %s", (session['user_id'],))
-    result = cursor.fetchone()
-    cursor.close()
-    conn.close()
+    # Verificar el rol del usuario (primero en la caché de sesiones, luego en la base de datos)
+    result = obtener_sesion(session['user_id'])
+    if result is not None and (result['session_token'] != session.get('session_token') or result['activo'] == 0):
+        # La entrada pudo quedar vieja si el cambio pasó en otro worker: solo se rechaza tras consultar la base
+        invalidar_sesion(session['user_id'])
+        result = None
+    if result is None:
+        with conectar_db() as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("SELECT session_token, activo, rol FROM usuarios WHERE id = %s", (session['user_id'],))
+            result = cursor.fetchone()
+            cursor.close()
+        if result:
+            guardar_sesion(session['user_id'], result)
 
     # Verificar el estado y rol del usuario
     if not result or result['session_token'] != session.get('session_token'):
@@ -106,29 +127,29 @@ def login():
         username = request.form['username']
         password = request.form['password']
 
-        conn = conectar_db()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM usuarios WHERE nombre_usuario = %s AND contrasena = MD5(%s)", (username, password))
-        user = cursor.fetchone()
-        cursor.close()
-        conn.close()
+        with conectar_db() as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("SELECT id, nombre_usuario, rol FROM usuarios WHERE nombre_usuario = %s AND contrasena = MD5(%s)", (username, password))
+            user = cursor.fetchone()
+            cursor.close()
 
         if user:
             # Generar un token de sesión único
             session_token = os.urandom(24).hex()
             
             # Forzar logout si el usuario ya está activo en otro lugar
-            if user["id"] in active_sessions:
-                socketio.emit('force_logout', {'message': 'Tu cuenta se inició en otro dispositivo.'}, to=active_sessions[user["id"]])
-                del active_sessions[user["id"]]
+            sid_anterior = active_sessions.obtener(user["id"])
+            if sid_anterior:
+                socketio.emit('force_logout', {'message': 'Tu cuenta se inició en otro dispositivo.'}, to=sid_anterior)
+                active_sessions.eliminar(user["id"], sid_anterior)
 
             # Actualizar el token de sesión en la base de datos
-            conn = conectar_db()
-            cursor = conn.cursor()
-            cursor.execute("UPDATE usuarios SET session_token = %s WHERE id = %s", (session_token, user['id']))
-            conn.commit()
-            cursor.close()
-            conn.close()
+            with conectar_db() as conn:
+                cursor = conn.cursor()
+                cursor.execute("UPDATE usuarios SET session_token = %s WHERE id = %s", (session_token, user['id']))
+                conn.commit()
+                cursor.close()
+            invalidar_sesion(user['id'])
 
             # Establecer sesión en Flask y almacenar en memoria
             session.permanent = True
@@ -149,13 +170,19 @@ def login():
 @app.route('/user')
 @admin_required
 def listar_usuarios():
-    conn = conectar_db()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM usuarios")
-    users = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    return render_template('usuarios.html', users=users)
+    # Búsqueda y paginación por nombre (usuarios.py): ?q=&rol=&activo=&despues=|antes=
+    filtros = usuarios.leer_filtros(request.args)
+    with conectar_db() as conn:
+        cursor = conn.cursor(dictionary=True)
+        users, hay_anterior, hay_siguiente = usuarios.pagina_usuarios(
+            cursor, filtros, despues=request.args.get('despues'), antes=request.args.get('antes')
+        )
+        cursor.close()
+    return render_template(
+        'usuarios.html', users=users, filtros=filtros, roles=usuarios.ROLES,
+        filtros_url={campo: valor for campo, valor in filtros.items() if valor},
+        hay_anterior=hay_anterior, hay_siguiente=hay_siguiente,
+    )
 
 # Ruta para agregar usuario
 @app.route('/user/add', methods=['GET', 'POST'])
@@ -176,13 +203,18 @@ def agregar_usuario():
         # Hashear la contraseña antes de guardarla en la base de datos
         hashed_password = os.urandom(24).hex()  # En lugar de MD5, sería mejor usar bcrypt o hashlib para mayor seguridad
 
-        conn = conectar_db()
-        cursor = conn.cursor()
-        cursor.execute("INSERT INTO usuarios (nombre_usuario, contrasena, rol, activo) VALUES (%s, MD5(%s), %s, %s)", 
-                       (username, password, rol, activo))
-        conn.commit()
-        cursor.close()
-        conn.close()
+        with conectar_db() as conn:
+            cursor = conn.cursor()
+            # nombre_usuario es único (migraciones/002_usuarios.sql)
+            cursor.execute("SELECT id FROM usuarios WHERE nombre_usuario = %s", (username,))
+            if cursor.fetchone() is not None:
+                cursor.close()
+                flash("Ese nombre de usuario ya existe.")
+                return redirect(url_for('agregar_usuario'))
+            cursor.execute("INSERT INTO usuarios (nombre_usuario, contrasena, rol, activo) VALUES (%s, MD5(%s), %s, %s)", 
+                           (username, password, rol, activo))
+            conn.commit()
+            cursor.close()
 
         flash("Usuario agregado exitosamente.")
         return redirect(url_for('listar_usuarios'))
@@ -193,38 +225,43 @@ def agregar_usuario():
 @app.route('/user/edit/<int:user_id>', methods=['GET', 'POST'])
 @admin_required
 def editar_usuario(user_id):
-    conn = conectar_db()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM usuarios WHERE id = %s", (user_id,))
-    user = cursor.fetchone()
+    with conectar_db() as conn:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute("SELECT id, nombre_usuario, rol, activo FROM usuarios WHERE id = %s", (user_id,))
+        user = cursor.fetchone()
 
-    if request.method == 'POST':
-        username = request.form['username']
-        rol = request.form['rol']
-        activo = request.form.get('activo', '0')
+        if request.method == 'POST':
+            username = request.form['username']
+            rol = request.form['rol']
+            activo = request.form.get('activo', '0')
 
-        cursor.execute("UPDATE usuarios SET nombre_usuario = %s, rol = %s, activo = %s WHERE id = %s", (username, rol, activo, user_id))
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
-        flash("Usuario actualizado exitosamente.")
-        return redirect(url_for('listar_usuarios'))
+            cursor.execute("SELECT id FROM usuarios WHERE nombre_usuario = %s AND id <> %s", (username, user_id))
+            if cursor.fetchone() is not None:
+                cursor.close()
+                flash("Ese nombre de usuario ya existe.")
+                return redirect(url_for('editar_usuario', user_id=user_id))
 
-    cursor.close()
-    conn.close()
+            cursor.execute("UPDATE usuarios SET nombre_usuario = %s, rol = %s, activo = %s WHERE id = %s", (username, rol, activo, user_id))
+            conn.commit()
+            cursor.close()
+            invalidar_sesion(user_id)
+
+            flash("Usuario actualizado exitosamente.")
+            return redirect(url_for('listar_usuarios'))
+
+        cursor.close()
     return render_template('nuevo_usuario.html', user=user, action="Editar Usuario")
 
 # Ruta para eliminar usuario
 @app.route('/user/delete/<int:user_id>', methods=['POST'])
 @admin_required
 def eliminar_usuario(user_id):
-    conn = conectar_db()
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM usuarios WHERE id = %s", (user_id,))
-    conn.commit()
-    cursor.close()
-    conn.close()
+    with conectar_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM usuarios WHERE id = %s", (user_id,))
+        conn.commit()
+        cursor.close()
+    invalidar_sesion(user_id)
 
     flash("Usuario eliminado exitosamente.")
     return redirect(url_for('listar_usuarios'))
@@ -233,30 +270,89 @@ def eliminar_usuario(user_id):
 @app.route('/user/toggle/<int:user_id>')
 @admin_required
 def toggle_usuario(user_id):
-    conn = conectar_db()
-    cursor = conn.cursor()
-    cursor.execute("UPDATE usuarios SET activo = NOT activo WHERE id = %s", (user_id,))
-    conn.commit()
-    cursor.close()
-    conn.close()
+    with conectar_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("UPDATE usuarios SET activo = NOT activo WHERE id = %s", (user_id,))
+        conn.commit()
+        cursor.close()
+    invalidar_sesion(user_id)
 
     flash("Estado del usuario actualizado.")
     return redirect(url_for('listar_usuarios'))
 
+# Ruta con las métricas del pool de conexiones a la base de datos
+@app.route('/admin/pool_db')
+@admin_required
+def metricas_pool_db():
+    return jsonify(obtener_pool().metricas())
+
+# Métricas calculadas al exportar: cachés, pool de conexiones, cola de trabajos, folios y admisión
+def _estadisticas_caches():
+    caches = {"qr_" + tipo: estadisticas for tipo, estadisticas in qr_cache_stats().items()}
+    caches["salida"] = output_cache.estadisticas()
+    caches["estado"] = state_cache.estadisticas()
+    caches["vista_previa"] = preview_cache.estadisticas()
+    caches["vista_previa_cargas"] = preview_uploads.estadisticas()
+    return caches
+
+for _campo, _tipo in (("aciertos", "counter"), ("fallos", "counter"), ("desalojos", "counter"), ("entradas", "gauge"), ("bytes", "gauge")):
+    metricas.registrar_colector(
+        f"enmarcado_cache_{_campo}" + ("_total" if _tipo == "counter" else ""),
+        f"Caché por nombre: {_campo}.", _tipo,
+        lambda campo=_campo: {nombre: datos[campo] for nombre, datos in _estadisticas_caches().items()},
+        clave_etiqueta="cache",
+    )
+
+for _campo, _tipo in (("en_uso", "gauge"), ("libres", "gauge"), ("creadas", "counter"), ("esperas", "counter"), ("agotadas", "counter"), ("tiempo_espera_total", "counter")):
+    metricas.registrar_colector(
+        f"mysql_pool_{_campo}" + ("_total" if _tipo == "counter" and not _campo.endswith("_total") else ""),
+        f"Pool de conexiones MySQL: {_campo}.", _tipo,
+        lambda campo=_campo: obtener_pool().metricas()[campo],
+    )
+
+for _campo in ("en_cola", "en_proceso"):
+    metricas.registrar_colector(
+        f"enmarcado_trabajos_{_campo}", f"Trabajos de enmarcado {_campo.replace('_', ' ')}.", "gauge",
+        lambda campo=_campo: trabajos.estadisticas()[campo],
+    )
+
+for _campo, _tipo in (("emitidos", "counter"), ("bloques", "counter"), ("reservas_en_espera", "counter"), ("errores_registro", "counter"), ("registro_saturado", "counter"), ("disponibles", "gauge"), ("pendientes_registro", "gauge")):
+    metricas.registrar_colector(
+        f"enmarcado_folios_{_campo}" + ("_total" if _tipo == "counter" else ""),
+        f"Asignador de folios de este proceso: {_campo.replace('_', ' ')}.", _tipo,
+        lambda campo=_campo: folios.estadisticas()[campo],
+    )
+
+metricas.registrar_colector(
+    "enmarcado_admision_total", "Solicitudes de enmarcado admitidas o rechazadas por motivo.", "counter",
+    lambda: admision.estadisticas()["resultados"],
+    clave_etiqueta="resultado",
+)
+for _campo in ("en_vuelo", "usuarios"):
+    metricas.registrar_colector(
+        f"enmarcado_admision_{_campo}", f"Control de admisión de este proceso: {_campo.replace('_', ' ')}.", "gauge",
+        lambda campo=_campo: admision.estadisticas()[campo],
+    )
+
+# Métricas en formato de texto de Prometheus (solo administradores)
+@app.route('/metrics')
+@admin_required
+def metrics():
+    return metricas.exportar_prometheus(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
 # Ruta de Logout
 @app.route('/logout')
 def logout():
     user_id = session.get('user_id')
     if user_id:
-        conn = conectar_db()
-        cursor = conn.cursor()
-        cursor.execute("UPDATE usuarios SET session_token = NULL WHERE id = %s", (user_id,))
-        conn.commit()
-        cursor.close()
-        conn.close()
+        with conectar_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute("UPDATE usuarios SET session_token = NULL WHERE id = %s", (user_id,))
+            conn.commit()
+            cursor.close()
+        invalidar_sesion(user_id)
 
-        if user_id in active_sessions:
-            del active_sessions[user_id]
+        active_sessions.eliminar(user_id)
     session.clear()
     return redirect(url_for('login'))
 
@@ -265,25 +361,32 @@ def logout():
 def connect():
     user_id = session.get('user_id')
     if user_id:
-        # Verificar si el usuario ya tiene una sesión activa
-        if user_id in active_sessions:
-            # Desconectar la sesión anterior
-            socketio.emit('force_logout', {'message': 'Tu cuenta se inició en otro dispositivo.'}, to=active_sessions[user_id])
-            # Eliminar la sesión anterior
-            del active_sessions[user_id]
-
-        # Registrar la nueva sesión
-        active_sessions[user_id] = request.sid
+        # Registrar la nueva sesión y desconectar la anterior, si había una
+        sid_anterior = active_sessions.registrar(user_id, request.sid)
+        if sid_anterior and sid_anterior != request.sid:
+            socketio.emit('force_logout', {'message': 'Tu cuenta se inició en otro dispositivo.'}, to=sid_anterior)
     else:
         disconnect()
 # Evento de desconexión a SocketIO
 @socketio.on('disconnect')
 def disconnect_handler():
     user_id = session.get('user_id')
-    if user_id and user_id in active_sessions:
-        del active_sessions[user_id]
+    if user_id:
+        # Solo se quita si el socket que se desconecta sigue siendo el registrado
+        active_sessions.eliminar(user_id, request.sid)
 
 if __name__ == "__main__":
+    import time
+    from concurrent.futures import wait
     from waitress import serve
+    import lotes
+    # Calentar el proceso (plantillas, esqueletos, fuentes, QR y código de barras)
+    # antes de aceptar tráfico; con ENMARCADO_CALENTAR_PROCESOS también arrancan en
+    # paralelo esos procesos del pool de lotes (por omisión ninguno)
+    inicio = time.perf_counter()
+    procesos = lotes.calentar_pool()
+    warm_up()
+    wait(procesos)
+    print(f"Calentamiento terminado en {(time.perf_counter() - inicio) * 1000:.0f} ms ({len(procesos)} procesos del pool)")
     serve(app, host="0.0.0.0", port=int(os.getenv("PORT", 5000)))
 
@@ -0,0 +1,198 @@
+import os
+import time
+import threading
+from collections import deque
+
+# Pool de conexiones a MySQL.
+# Las rutas toman la conexión con `with conectar_db() as conn:`; al salir del bloque
+# (también por una excepción) close() no cierra el socket sino que la devuelve al
+# pool. Una conexión que no se devuelve ocupa su lugar en el pool para siempre.
+# Las primitivas de sincronización son las de `threading`: con waitress son hilos
+# reales y con gevent (gunicorn -k gevent / monkey.patch_all) quedan parcheadas y
+# las esperas ceden el control a otros greenlets en lugar de bloquear el proceso.
+
+POOL_TAMANO = int(os.getenv("MYSQL_POOL_TAMANO", "5"))  # Conexiones que se mantienen abiertas
+POOL_DESBORDE = int(os.getenv("MYSQL_POOL_DESBORDE", "10"))  # Conexiones extra temporales
+POOL_ESPERA = float(os.getenv("MYSQL_POOL_ESPERA", "10"))  # Segundos máximos esperando conexión
+POOL_RECICLAR = float(os.getenv("MYSQL_POOL_RECICLAR", "1800"))  # Vida máxima de una conexión
+# Las conexiones que estuvieron inactivas más de estos segundos se verifican con ping al tomarlas
+POOL_VERIFICAR_INACTIVA = float(os.getenv("MYSQL_POOL_VERIFICAR_INACTIVA", "5"))
+
+
+class PoolAgotado(Exception):
+    """No se obtuvo una conexión dentro del tiempo de espera."""
+
+
+class ConexionPool:
+    """Conexión prestada por el pool; close() la devuelve en lugar de cerrarla."""
+
+    def __init__(self, pool, conexion, creada):
+        self._pool = pool
+        self._conexion = conexion
+        self.creada = creada
+        self.devuelta = time.monotonic()
+        self.prestada = False
+
+    def __getattr__(self, nombre):
+        return getattr(self._conexion, nombre)
+
+    def close(self):
+        if self.prestada:
+            self._pool.devolver(self)
+
+    def cerrar_definitivamente(self):
+        try:
+            self._conexion.close()
+        except Exception:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class PoolConexiones:
+    """Pool con tamaño fijo más desborde, verificación al prestar y reciclaje por antigüedad."""
+
+    def __init__(self, crear, tamano=POOL_TAMANO, desborde=POOL_DESBORDE, espera=POOL_ESPERA,
+                 reciclar=POOL_RECICLAR, verificar_inactiva=POOL_VERIFICAR_INACTIVA):
+        self._crear = crear
+        self.tamano = tamano
+        self.desborde = desborde
+        self.espera = espera
+        self.reciclar = reciclar
+        self.verificar_inactiva = verificar_inactiva
+        self._capacidad = threading.BoundedSemaphore(tamano + desborde)
+        self._libres = deque()
+        self._lock = threading.Lock()
+        self._metricas = {
+            "creadas": 0,
+            "en_uso": 0,
+            "esperas": 0,
+            "tiempo_espera_total": 0.0,
+            "agotadas": 0,
+            "recicladas": 0,
+            "descartadas": 0,
+        }
+
+    def _nueva(self):
+        conexion = ConexionPool(self, self._crear(), time.monotonic())
+        with self._lock:
+            self._metricas["creadas"] += 1
+        return conexion
+
+    def _saludable(self, conexion, ahora):
+        """Descarta conexiones vencidas o que no responden al ping."""
+        if ahora - conexion.creada > self.reciclar:
+            with self._lock:
+                self._metricas["recicladas"] += 1
+            return False
+        if ahora - conexion.devuelta > self.verificar_inactiva:
+            try:
+                conexion.ping(reconnect=False)
+            except Exception:
+                with self._lock:
+                    self._metricas["descartadas"] += 1
+                return False
+        return True
+
+    def obtener(self):
+        """Presta una conexión; espera hasta `espera` segundos si el pool está lleno."""
+        if not self._capacidad.acquire(blocking=False):
+            inicio = time.monotonic()
+            obtenida = self._capacidad.acquire(timeout=self.espera)
+            with self._lock:
+                self._metricas["esperas"] += 1
+                self._metricas["tiempo_espera_total"] += time.monotonic() - inicio
+                if not obtenida:
+                    self._metricas["agotadas"] += 1
+            if not obtenida:
+                raise PoolAgotado(f"No hay conexiones disponibles tras {self.espera} s.")
+
+        try:
+            conexion = None
+            while conexion is None:
+                with self._lock:
+                    conexion = self._libres.pop() if self._libres else None
+                if conexion is None:
+                    conexion = self._nueva()
+                elif not self._saludable(conexion, time.monotonic()):
+                    conexion.cerrar_definitivamente()
+                    conexion = None
+        except Exception:
+            self._capacidad.release()
+            raise
+
+        conexion.prestada = True
+        with self._lock:
+            self._metricas["en_uso"] += 1
+        return conexion
+
+    def devolver(self, conexion):
+        """Regresa una conexión al pool (o la cierra si sobra, venció o quedó en mal estado)."""
+        conexion.prestada = False
+        conservar = time.monotonic() - conexion.creada <= self.reciclar
+        if conservar:
+            try:
+                if conexion.in_transaction:
+                    conexion.rollback()
+            except Exception:
+                conservar = False
+        with self._lock:
+            self._metricas["en_uso"] -= 1
+            if conservar and len(self._libres) < self.tamano:
+                conexion.devuelta = time.monotonic()
+                self._libres.append(conexion)
+                conexion = None
+        if conexion is not None:
+            conexion.cerrar_definitivamente()
+        self._capacidad.release()
+
+    def metricas(self):
+        """Conexiones en uso, libres, esperas y tiempo total de espera."""
+        with self._lock:
+            metricas = dict(self._metricas)
+            metricas["libres"] = len(self._libres)
+        metricas["tamano"] = self.tamano
+        metricas["desborde"] = self.desborde
+        return metricas
+
+    def cerrar(self):
+        """Cierra las conexiones libres (las prestadas se cierran al devolverse)."""
+        with self._lock:
+            libres = list(self._libres)
+            self._libres.clear()
+            self.tamano = 0
+        for conexion in libres:
+            conexion.cerrar_definitivamente()
+
+
+def _crear_conexion_mysql():
+    import mysql.connector
+    return mysql.connector.connect(
+        host=os.environ.get('MYSQL_HOST'),
+        user=os.environ.get('MYSQL_USER'),
+        password=os.environ.get('MYSQL_PASSWORD'),
+        database=os.environ.get('MYSQL_DATABASE')
+    )
+
+
+def _crear_conexion_local():
+    import db_local
+    return db_local.conectar(os.environ['MYSQL_LOCAL_PATH'])
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def obtener_pool():
+    """Pool global; con MYSQL_LOCAL_PATH definido usa la base local de pruebas (db_local)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            crear = _crear_conexion_local if os.environ.get('MYSQL_LOCAL_PATH') else _crear_conexion_mysql
+            _pool = PoolConexiones(crear)
+        return _pool
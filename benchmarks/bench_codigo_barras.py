@@ -0,0 +1,203 @@
+"""Micro-benchmark del código de barras del folio: motor nativo contra la ruta SVG/cairosvg anterior.
+
+Uso (desde la raíz del repositorio):
+    python benchmarks/bench_codigo_barras.py [--repeticiones 200]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz  # PyMuPDF para manejar PDFs
+from codigos import generate_barcode, draw_barcode
+
+RECT_FOLIO = fitz.Rect(45, 72, 175, 87)
+
+
+def generate_barcode_legacy(text):
+    """Ruta anterior: Code128 → SVG → regex → cairosvg (con respaldo en PIL), tal como estaba en enmarcado.py."""
+    try:
+        from barcode import Code128
+        from barcode.writer import SVGWriter
+        from io import StringIO
+        import re
+        from cairosvg import svg2png
+        
+        # Crear un objeto StringIO para el contenido SVG
+        svg_io = StringIO()
+        
+        # Configurar el escritor SVG con opciones que eliminen completamente el texto
+        svg_options = {
+            'write_text': False,      # Desactivar el texto
+            'text': '',               # Texto vacío
+            'module_height': 15,      # Altura de las barras en mm
+            'module_width': 0.25,     # Ancho de cada barra
+            'quiet_zone': 3,          # Margen de seguridad
+            'font_size': 0,           # Tamaño de fuente cero
+            'dpi': 300,               # Alta resolución
+            'text_distance': 0        # Sin distancia para texto
+        }
+        
+        # Generar código de barras Code128 en formato SVG
+        Code128(text, writer=SVGWriter(svg_options)).write(svg_io)
+        
+        # Obtener el contenido SVG
+        svg_content = svg_io.getvalue()
+        
+        # Eliminar cualquier elemento de texto en el SVG usando expresiones regulares
+        svg_content = re.sub(r'<text.*?</text>', '', svg_content, flags=re.DOTALL)
+        
+        # Ajustar las dimensiones del SVG para recortar la parte inferior donde aparecería el texto
+        width_match = re.search(r'width="(\d+(\.\d+)?)"', svg_content)
+        height_match = re.search(r'height="(\d+(\.\d+)?)"', svg_content)
+        
+        if width_match and height_match:
+            original_height = float(height_match.group(1))
+            # Usar solo el 60% superior del SVG para eliminar el área donde estaría el texto
+            new_height = original_height * 0.6
+            
+            svg_content = svg_content.replace(
+                f'width="{width_match.group(1)}"', 'width="130"'
+            ).replace(
+                f'height="{height_match.group(1)}"', f'height="{new_height}"'
+            )
+            
+            # Ajustar el viewBox para recortar la parte inferior
+            viewbox_match = re.search(r'viewBox="([^"]*)"', svg_content)
+            if viewbox_match:
+                viewbox_parts = viewbox_match.group(1).split(' ')
+                if len(viewbox_parts) == 4:
+                    viewbox_parts[3] = str(float(viewbox_parts[3]) * 0.6)  # Reducir altura del viewBox
+                    new_viewbox = ' '.join(viewbox_parts)
+                    svg_content = svg_content.replace(viewbox_match.group(0), f'viewBox="{new_viewbox}"')
+        
+        # Convertir el SVG modificado a PNG con alta resolución
+        png_data = BytesIO()
+        svg2png(
+            bytestring=svg_content.encode('utf-8'),
+            write_to=png_data,
+            output_width=390,
+            output_height=40,  # Reducir altura para evitar espacio en blanco
+            scale=3.0
+        )
+        png_data.seek(0)
+        
+        # Crear un Pixmap de PyMuPDF
+        barcode_img = fitz.Pixmap(png_data)
+        return barcode_img
+        
+    except Exception as e:
+        print(f"Error generando código de barras SVG: {e}")
+        # Método alternativo usando PIL/Pillow
+        try:
+            from PIL import Image, ImageDraw
+            from barcode import Code128
+            from barcode.writer import ImageWriter
+            
+            # Configurar opciones personalizadas para el ImageWriter
+            class CustomImageWriter(ImageWriter):
+                def _paint_text(self, *args, **kwargs):
+                    # Sobrescribir el método de pintar texto para que no haga nada
+                    pass
+            
+            # Crear un escritor personalizado
+            writer = CustomImageWriter()
+            writer.set_options({
+                'write_text': False,
+                'text': '',
+                'font_size': 0,
+                'text_distance': 0,
+                'module_height': 15.0,
+                'module_width': 0.2,
+                'quiet_zone': 3.0,
+                'background': (255, 255, 255),
+                'foreground': (0, 0, 0),
+                'dpi': 300
+            })
+            
+            # Generar código de barras
+            output = BytesIO()
+            Code128(text, writer=writer).write(output)
+            output.seek(0)
+            
+            # Abrir la imagen
+            img = Image.open(output)
+            
+            # Recortar la parte inferior para eliminar cualquier espacio donde podría estar el texto
+            width, height = img.size
+            # Conservar solo el 60% superior de la imagen
+            new_height = int(height * 0.6)
+            img = img.crop((0, 0, width, new_height))
+            
+            # Redimensionar con algoritmo de alta calidad
+            img = img.resize((390, 40), Image.LANCZOS)
+            
+            # Guardar con formato PNG sin compresión
+            img_bytes = BytesIO()
+            img.save(img_bytes, format="PNG", optimize=False, compression=0)
+            img_bytes.seek(0)
+            
+            return fitz.Pixmap(img_bytes)
+            
+        except Exception as backup_error:
+            print(f"Error en método de respaldo: {backup_error}")
+            return None
+
+
+def _folios(repeticiones):
+    return ["A30" + str(random.randint(100000, 999999)) for _ in range(repeticiones)]
+
+
+def _estampar_legacy(page, text):
+    barcode_img = generate_barcode_legacy(text)
+    if barcode_img:
+        page.insert_image(RECT_FOLIO, pixmap=barcode_img, keep_proportion=True, overlay=True)
+
+
+def _estampar_pixmap(page, text):
+    page.insert_image(RECT_FOLIO, pixmap=generate_barcode(text), keep_proportion=True, overlay=True)
+
+
+def _estampar_vector(page, text):
+    draw_barcode(page, RECT_FOLIO, text)
+
+
+def medir(nombre, estampar, folios):
+    """Estampa cada folio en una página nueva, guarda el PDF y reporta tiempo y tamaño promedio."""
+    tiempos = []
+    tamanos = []
+    for text in folios:
+        inicio = time.perf_counter()
+        doc = fitz.open()
+        page = doc.new_page()
+        estampar(page, text)
+        salida = BytesIO()
+        doc.save(salida, garbage=3, deflate=True)
+        doc.close()
+        tiempos.append(time.perf_counter() - inicio)
+        tamanos.append(salida.getbuffer().nbytes)
+    tiempos.sort()
+    print(
+        f"{nombre:<22} media {sum(tiempos) / len(tiempos) * 1000:8.3f} ms"
+        f"   p95 {tiempos[int(len(tiempos) * 0.95) - 1] * 1000:8.3f} ms"
+        f"   PDF {sum(tamanos) / len(tamanos):9.0f} bytes"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeticiones", type=int, default=200)
+    args = parser.parse_args()
+
+    folios = _folios(args.repeticiones)
+    medir("anterior (SVG/PIL)", _estampar_legacy, folios)
+    medir("nativo (pixmap)", _estampar_pixmap, folios)
+    medir("nativo (vectorial)", _estampar_vector, folios)
+
+
+if __name__ == "__main__":
+    main()
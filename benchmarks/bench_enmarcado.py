@@ -0,0 +1,355 @@
+"""Benchmark reproducible del enmarcado de actas.
+
+Mide las funciones del pipeline (overlay_pdf_on_background, generate_qr_code,
+generate_barcode) y la ruta /process_pdf con el cliente de pruebas de Flask, usando
+actas sintéticas para todas las abreviaturas de ESTADOS y todas las combinaciones
+de marco delantero / trasero / folio, además de cada perfil de guardado (tiempo de
+CPU contra bytes de salida) y de PDFs con varias actas (el costo debe crecer
+lineal) y de las vistas previas (una página rasterizada, sin guardar el PDF).
+Reporta rendimiento, latencias p50/p95/p99, RSS máximo y tamaño de
+salida, y guarda los resultados en JSON para compararlos entre corridas.
+Los folios se emiten desde una base local desechable (benchmarks/resultados/bench.db).
+
+Uso (desde la raíz del repositorio):
+    python benchmarks/bench_enmarcado.py [--repeticiones 3] [--salida resultados.json]
+    python benchmarks/bench_enmarcado.py --comparar benchmarks/resultados/anterior.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import resource
+import argparse
+import platform
+import itertools
+import contextlib
+from io import BytesIO
+from datetime import datetime
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+os.chdir(RAIZ)  # Las rutas de las plantillas son relativas a la raíz
+# Los folios se emiten desde una base local desechable, nunca desde la de producción
+os.makedirs(os.path.join(RAIZ, "benchmarks", "resultados"), exist_ok=True)
+os.environ["MYSQL_LOCAL_PATH"] = os.path.join(RAIZ, "benchmarks", "resultados", "bench.db")
+
+import fitz  # PyMuPDF para manejar PDFs
+from werkzeug.datastructures import FileStorage
+
+import enmarcado
+from enmarcado import ESTADOS, SAVE_PROFILES, overlay_pdf_on_background, generate_qr_code, generate_barcode
+
+COMBINACIONES = list(itertools.product((False, True), repeat=3))  # (delantero, trasero, folio)
+UMBRAL_REGRESION = 0.10  # 10 % más lento que la corrida de referencia
+
+
+def acta_sintetica(state_abbr, semilla):
+    """PDF de una página con texto de acta y su nombre tipo CURP con el estado indicado."""
+    aleatorio = random.Random(semilla)
+    curp = f"GOMC{aleatorio.randint(40, 99)}0101H{state_abbr}RRR{aleatorio.randint(0, 9)}{aleatorio.randint(0, 9)}"
+    doc = fitz.open()
+    page = doc.new_page(width=612, height=792)
+    page.insert_text((72, 150), "ACTA DE NACIMIENTO", fontsize=18)
+    page.insert_text((72, 190), f"CURP: {curp}", fontsize=12)
+    page.insert_text((72, 210), f"Entidad: {ESTADOS[state_abbr]}", fontsize=12)
+    for renglon in range(25):
+        page.insert_text((72, 240 + renglon * 18), "Dato registral " + "x" * aleatorio.randint(20, 60), fontsize=10)
+    datos = doc.tobytes()
+    doc.close()
+    return f"{curp}.pdf", datos
+
+
+def actas_sinteticas():
+    return [acta_sintetica(abbr, indice) for indice, abbr in enumerate(sorted(ESTADOS))]
+
+
+def rss_maximo_mb():
+    """RSS máximo del proceso hasta el momento (ru_maxrss está en KB en Linux y en bytes en macOS)."""
+    maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maximo / (1024 * 1024) if sys.platform == "darwin" else maximo / 1024
+
+
+def percentil(valores_ordenados, p):
+    if not valores_ordenados:
+        return 0.0
+    indice = min(len(valores_ordenados) - 1, max(0, round(p / 100 * len(valores_ordenados) + 0.5) - 1))
+    return valores_ordenados[indice]
+
+
+def resumir(nombre, tiempos, tamanos, errores=0, tiempos_cpu=None):
+    """Estadísticas de un escenario a partir de los tiempos (s) y tamaños de salida (bytes)."""
+    ordenados = sorted(tiempos)
+    total = sum(tiempos)
+    resumen = {
+        "escenario": nombre,
+        "n": len(tiempos),
+        "errores": errores,
+        "por_segundo": len(tiempos) / total if total else 0.0,
+        "p50_ms": percentil(ordenados, 50) * 1000,
+        "p95_ms": percentil(ordenados, 95) * 1000,
+        "p99_ms": percentil(ordenados, 99) * 1000,
+        "salida_promedio_bytes": sum(tamanos) / len(tamanos) if tamanos else 0,
+        "rss_max_mb": rss_maximo_mb(),
+    }
+    if tiempos_cpu:
+        resumen["cpu_promedio_ms"] = sum(tiempos_cpu) / len(tiempos_cpu) * 1000
+    print(
+        f"{nombre:<44} n={resumen['n']:<5} {resumen['por_segundo']:8.1f}/s"
+        f"  p50 {resumen['p50_ms']:7.2f}  p95 {resumen['p95_ms']:7.2f}  p99 {resumen['p99_ms']:7.2f} ms"
+        f"  salida {resumen['salida_promedio_bytes'] / 1024:8.1f} KB  RSS {resumen['rss_max_mb']:6.1f} MB"
+        + (f"  CPU {resumen['cpu_promedio_ms']:6.2f} ms" if tiempos_cpu else "")
+        + (f"  errores {errores}" if errores else "")
+    )
+    return resumen
+
+
+def nombre_combinacion(apply_front, apply_rear, apply_folio):
+    partes = [nombre for nombre, activa in (("delantero", apply_front), ("trasero", apply_rear), ("folio", apply_folio)) if activa]
+    return "+".join(partes) or "sin_marcos"
+
+
+def bench_overlay(actas, repeticiones, con_cache):
+    """overlay_pdf_on_background directo, por combinación de opciones."""
+    resultados = []
+    for apply_front, apply_rear, apply_folio in COMBINACIONES:
+        tiempos, tamanos, errores = [], [], 0
+        for _ in range(repeticiones):
+            for nombre, datos in actas:
+                if not con_cache:
+                    enmarcado.output_cache.limpiar()
+                salida = BytesIO()
+                inicio = time.perf_counter()
+                success, _ = overlay_pdf_on_background(FileStorage(BytesIO(datos), filename=nombre), salida, apply_front, apply_rear, apply_folio)
+                tiempos.append(time.perf_counter() - inicio)
+                tamanos.append(salida.getbuffer().nbytes)
+                errores += not success
+        resultados.append(resumir(f"overlay:{nombre_combinacion(apply_front, apply_rear, apply_folio)}", tiempos, tamanos, errores))
+    return resultados
+
+
+def bench_perfiles(actas, repeticiones):
+    """overlay_pdf_on_background con cada perfil de guardado: tiempo de CPU contra bytes de salida."""
+    resultados = []
+    for perfil in SAVE_PROFILES:
+        for apply_front, apply_rear, apply_folio in ((True, True, True), (False, True, False)):
+            tiempos, tiempos_cpu, tamanos, errores = [], [], [], 0
+            for _ in range(repeticiones):
+                for nombre, datos in actas:
+                    enmarcado.output_cache.limpiar()
+                    salida = BytesIO()
+                    inicio, inicio_cpu = time.perf_counter(), time.process_time()
+                    success, _ = overlay_pdf_on_background(
+                        FileStorage(BytesIO(datos), filename=nombre), salida, apply_front, apply_rear, apply_folio, perfil
+                    )
+                    tiempos_cpu.append(time.process_time() - inicio_cpu)
+                    tiempos.append(time.perf_counter() - inicio)
+                    tamanos.append(salida.getbuffer().nbytes)
+                    errores += not success
+            combinacion = nombre_combinacion(apply_front, apply_rear, apply_folio)
+            resultados.append(resumir(f"perfil:{perfil}:{combinacion}", tiempos, tamanos, errores, tiempos_cpu))
+    return resultados
+
+
+def bench_multiacta(actas, repeticiones):
+    """overlay_pdf_on_background con PDFs de 1, 10 y 50 actas de una página (paginas_por_acta=1)."""
+    resultados = []
+    for cantidad in (1, 10, 50):
+        paquete = fitz.open()
+        for indice in range(cantidad):
+            with fitz.open(stream=actas[indice % len(actas)][1], filetype="pdf") as acta:
+                paquete.insert_pdf(acta)
+        datos = paquete.tobytes()
+        paquete.close()
+        nombre = actas[0][0]
+        tiempos, tamanos, errores = [], [], 0
+        for _ in range(repeticiones):
+            enmarcado.output_cache.limpiar()
+            salida = BytesIO()
+            inicio = time.perf_counter()
+            success, _ = overlay_pdf_on_background(
+                FileStorage(BytesIO(datos), filename=nombre), salida, True, True, True, None, 1
+            )
+            tiempos.append(time.perf_counter() - inicio)
+            tamanos.append(salida.getbuffer().nbytes)
+            errores += not success
+        resultados.append(resumir(f"multiacta:{cantidad}", tiempos, tamanos, errores))
+    return resultados
+
+
+def bench_vista_previa(actas, repeticiones, con_cache):
+    """render_preview a la resolución predeterminada: primera página (marco, QR o folio) y del estado, PNG y WebP."""
+    resultados = []
+    for apply_front, apply_rear, apply_folio, pagina in ((True, True, True, 0), (False, True, False, 1), (False, False, False, 0)):
+        for formato in enmarcado.PREVIEW_FORMATS:
+            tiempos, tamanos, errores = [], [], 0
+            for _ in range(repeticiones):
+                for nombre, datos in actas:
+                    if not con_cache:
+                        enmarcado.preview_cache.limpiar()
+                    inicio = time.perf_counter()
+                    try:
+                        imagen, _, _ = enmarcado.render_preview(
+                            FileStorage(BytesIO(datos), filename=nombre), apply_front, apply_rear, apply_folio,
+                            page_num=pagina, image_format=formato,
+                        )
+                    except Exception:
+                        imagen = b""
+                        errores += 1
+                    tiempos.append(time.perf_counter() - inicio)
+                    tamanos.append(len(imagen))
+            combinacion = nombre_combinacion(apply_front, apply_rear, apply_folio)
+            resultados.append(resumir(f"vista_previa:{combinacion}:p{pagina}:{formato}", tiempos, tamanos, errores))
+    return resultados
+
+
+def bench_codigos(actas, repeticiones):
+    """generate_qr_code (sin y con caché) y generate_barcode."""
+    resultados = []
+    nombres = [nombre for nombre, _ in actas]
+
+    tiempos = []
+    for repeticion in range(repeticiones):
+        for nombre in nombres:
+            texto = f"{repeticion}-{nombre}"  # Texto nuevo: siempre falla la caché
+            inicio = time.perf_counter()
+            generate_qr_code(texto)
+            tiempos.append(time.perf_counter() - inicio)
+    resultados.append(resumir("generate_qr_code:sin_cache", tiempos, []))
+
+    for nombre in nombres:
+        generate_qr_code(nombre)  # Pasada sin medir: la caché ya tiene todos los nombres
+    tiempos = []
+    for _ in range(repeticiones):
+        for nombre in nombres:
+            inicio = time.perf_counter()
+            generate_qr_code(nombre)
+            tiempos.append(time.perf_counter() - inicio)
+    resultados.append(resumir("generate_qr_code:con_cache", tiempos, []))
+
+    tiempos = []
+    for _ in range(repeticiones * len(nombres)):
+        texto = "A30" + str(random.randint(100000, 999999))
+        inicio = time.perf_counter()
+        generate_barcode(texto)
+        tiempos.append(time.perf_counter() - inicio)
+    resultados.append(resumir("generate_barcode", tiempos, []))
+    return resultados
+
+
+def bench_ruta(actas, repeticiones, con_cache):
+    """POST /process_pdf con el cliente de pruebas de Flask (sesión simulada, sin base de datos).
+
+    El control de admisión se reemplaza por uno que no limita: se mide el enmarcado,
+    no el 429 de un solo usuario que agotó su ráfaga. Cualquier respuesta que no sea
+    200 detiene el benchmark.
+    """
+    import admision
+    from app import app
+
+    admision.LIMITES_POR_ROL['bench'] = {"tasa": 1e9, "rafaga": 1e9, "en_vuelo": 1}
+    admision.control = admision.ControlAdmision(global_tasa=1e9, global_rafaga=1e9)
+
+    cliente = app.test_client()
+    with cliente.session_transaction() as sesion:
+        sesion['user_id'] = 1
+        sesion['username'] = 'bench'
+        sesion['rol'] = 'bench'
+
+    silencio = open(os.devnull, "w")
+    resultados = []
+    for apply_front, apply_rear, apply_folio in COMBINACIONES:
+        formulario = {}
+        if apply_front:
+            formulario['front_frame'] = 'on'
+        if apply_rear:
+            formulario['rear_frame'] = 'on'
+        if apply_folio:
+            formulario['folio'] = 'on'
+        tiempos, tamanos = [], []
+        for _ in range(repeticiones):
+            for nombre, datos in actas:
+                if not con_cache:
+                    enmarcado.output_cache.limpiar()
+                inicio = time.perf_counter()
+                with contextlib.redirect_stdout(silencio):  # La ruta imprime cada archivo recibido
+                    respuesta = cliente.post(
+                        '/process_pdf',
+                        data={**formulario, 'pdf_file': (BytesIO(datos), nombre)},
+                        content_type='multipart/form-data',
+                    )
+                    cuerpo = respuesta.get_data()
+                tiempos.append(time.perf_counter() - inicio)
+                tamanos.append(len(cuerpo))
+                if respuesta.status_code != 200:
+                    raise SystemExit(f"/process_pdf respondió {respuesta.status_code} con {nombre}: {cuerpo[:200]!r}")
+        resultados.append(resumir(f"ruta:{nombre_combinacion(apply_front, apply_rear, apply_folio)}", tiempos, tamanos))
+    silencio.close()
+    return resultados
+
+
+def comparar(resultados, ruta_referencia):
+    """Imprime la variación de p50 y rendimiento contra una corrida anterior y marca regresiones."""
+    with open(ruta_referencia) as archivo:
+        referencia = {r["escenario"]: r for r in json.load(archivo)["resultados"]}
+    regresiones = 0
+    print(f"\nComparación contra {ruta_referencia}:")
+    for resultado in resultados:
+        anterior = referencia.get(resultado["escenario"])
+        if anterior is None or not anterior["p50_ms"]:
+            continue
+        cambio = (resultado["p50_ms"] - anterior["p50_ms"]) / anterior["p50_ms"]
+        marca = "  REGRESIÓN" if cambio > UMBRAL_REGRESION else ""
+        regresiones += bool(marca)
+        print(f"{resultado['escenario']:<44} p50 {anterior['p50_ms']:7.2f} → {resultado['p50_ms']:7.2f} ms ({cambio:+.1%}){marca}")
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeticiones", type=int, default=3, help="Pasadas sobre las actas sintéticas por escenario")
+    parser.add_argument("--solo", choices=("overlay", "perfiles", "multiacta", "vista_previa", "codigos", "ruta"), action="append", help="Limitar a ciertos grupos")
+    parser.add_argument("--con-cache", action="store_true", help="No vaciar las cachés de salida y de vistas previas entre solicitudes")
+    parser.add_argument("--salida", help="Archivo JSON de resultados (por omisión benchmarks/resultados/<fecha>.json)")
+    parser.add_argument("--comparar", help="JSON de una corrida anterior contra la cual comparar")
+    args = parser.parse_args()
+
+    random.seed(1234)
+    actas = actas_sinteticas()
+    enmarcado.warm_up()
+    grupos = args.solo or ["overlay", "perfiles", "multiacta", "vista_previa", "codigos", "ruta"]
+
+    resultados = []
+    if "overlay" in grupos:
+        resultados += bench_overlay(actas, args.repeticiones, args.con_cache)
+    if "perfiles" in grupos:
+        resultados += bench_perfiles(actas, args.repeticiones)
+    if "multiacta" in grupos:
+        resultados += bench_multiacta(actas, args.repeticiones)
+    if "vista_previa" in grupos:
+        resultados += bench_vista_previa(actas, args.repeticiones, args.con_cache)
+    if "codigos" in grupos:
+        resultados += bench_codigos(actas, args.repeticiones)
+    if "ruta" in grupos:
+        resultados += bench_ruta(actas, args.repeticiones, args.con_cache)
+
+    salida = args.salida or os.path.join(RAIZ, "benchmarks", "resultados", datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+    with open(salida, "w") as archivo:
+        json.dump({
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "pymupdf": fitz.VersionBind,
+            "plataforma": platform.platform(),
+            "repeticiones": args.repeticiones,
+            "con_cache": args.con_cache,
+            "resultados": resultados,
+        }, archivo, indent=2, ensure_ascii=False)
+    print(f"\nResultados guardados en {salida}")
+
+    if args.comparar and comparar(resultados, args.comparar):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Emisión concurrente de folios: rendimiento y unicidad entre procesos.
+
+Varios procesos (como los workers y el pool de lotes), cada uno con varios hilos,
+emiten folios a la vez contra la misma base local (db_local). Al final se vacía el
+registro de cada proceso y se comprueba en folios_emitidos que no haya folios
+repetidos ni emisiones perdidas. Reporta folios por segundo, latencia de emisión
+p50/p99/máx, los bloques reservados y cuántas emisiones tuvieron que esperar una
+reserva (con --pausa, que simula el ritmo real, deberían ser cero).
+
+Uso (desde la raíz del repositorio):
+    python benchmarks/bench_folios.py [--procesos 4] [--hilos 8] [--folios 5000] [--bloque 1000] [--pausa 0.5]
+"""
+import os
+import sys
+import time
+import argparse
+import multiprocessing
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def emitir_en_proceso(args):
+    """Emite `folios` folios repartidos en `hilos` hilos; devuelve (latencias, estadísticas)."""
+    indice, hilos, folios_por_proceso, pausa = args
+    import threading
+    import folios
+
+    latencias = []
+    lock = threading.Lock()
+
+    def emitir(cantidad):
+        propias = []
+        for numero in range(cantidad):
+            inicio = time.perf_counter()
+            folios.emitir_folio(f"proceso{indice}_{numero}.pdf", indice)
+            propias.append(time.perf_counter() - inicio)
+            if pausa:
+                time.sleep(pausa)
+        with lock:
+            latencias.extend(propias)
+
+    folios.preparar_folios()  # Como en el calentamiento del proceso
+    trabajadores = [threading.Thread(target=emitir, args=(folios_por_proceso // hilos,)) for _ in range(hilos)]
+    for trabajador in trabajadores:
+        trabajador.start()
+    for trabajador in trabajadores:
+        trabajador.join()
+    folios.obtener_asignador().vaciar_registro()
+    return latencias, folios.estadisticas()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--procesos", type=int, default=4)
+    parser.add_argument("--hilos", type=int, default=8, help="Hilos por proceso")
+    parser.add_argument("--folios", type=int, default=5000, help="Folios por proceso")
+    parser.add_argument("--bloque", type=int, default=1000, help="FOLIO_BLOQUE de cada proceso")
+    parser.add_argument("--pausa", type=float, default=0, help="ms entre emisiones de cada hilo (0: sin pausa, el peor caso)")
+    parser.add_argument("--db", help="Base local; por omisión benchmarks/resultados/folios.db (se reinicia)")
+    args = parser.parse_args()
+
+    db = args.db or os.path.join(RAIZ, "benchmarks", "resultados", "folios.db")
+    os.makedirs(os.path.dirname(os.path.abspath(db)), exist_ok=True)
+    for sufijo in ("", "-wal", "-shm"):
+        if os.path.exists(db + sufijo):
+            os.remove(db + sufijo)
+    # Los procesos hijos heredan la configuración por el entorno
+    os.environ["MYSQL_LOCAL_PATH"] = db
+    os.environ["FOLIO_BLOQUE"] = str(args.bloque)
+
+    contexto = multiprocessing.get_context("spawn")
+    inicio = time.perf_counter()
+    with contexto.Pool(args.procesos) as pool:
+        resultados = pool.map(emitir_en_proceso, [(indice, args.hilos, args.folios, args.pausa / 1000) for indice in range(args.procesos)])
+    duracion = time.perf_counter() - inicio
+
+    import db_local
+    from bench_enmarcado import percentil  # Después del pool: fija su propia base en el entorno
+
+    latencias = sorted(latencia for propias, _ in resultados for latencia in propias)
+    emitidos = len(latencias)
+    bloques = sum(estadisticas["bloques"] for _, estadisticas in resultados)
+    en_espera = sum(estadisticas["reservas_en_espera"] for _, estadisticas in resultados)
+
+    conexion = db_local.conectar(db)
+    cursor = conexion.cursor()
+    cursor.execute("SELECT COUNT(*), COUNT(DISTINCT folio) FROM folios_emitidos")
+    registrados, distintos = cursor.fetchone()
+    cursor.close()
+    conexion.close()
+
+    print(f"{args.procesos} procesos × {args.hilos} hilos, bloque {args.bloque}: {emitidos} folios en {duracion:.2f} s")
+    print(f"  {emitidos / duracion:10.0f} folios/s (incluye arranque de procesos y escritura del registro)")
+    print(
+        f"  emisión p50 {percentil(latencias, 50) * 1e6:.1f} µs  p99 {percentil(latencias, 99) * 1e6:.1f} µs"
+        f"  máx {latencias[-1] * 1e3:.2f} ms"
+    )
+    print(f"  bloques reservados {bloques}, emisiones que esperaron una reserva {en_espera}")
+    print(f"  registro: {registrados} filas, {distintos} folios distintos")
+    if registrados != emitidos or distintos != emitidos:
+        print("ERROR: hay folios repetidos o emisiones sin registrar")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
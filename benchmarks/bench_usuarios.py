@@ -0,0 +1,176 @@
+"""Listado de usuarios con paginación por llave: costo por página según el número de usuarios.
+
+Llena bases locales (db_local, con los índices de migraciones/002_usuarios.sql)
+con N usuarios de nombres al azar (5 % admin, 10 % inactivos) y mide, para cada
+tamaño, la consulta de usuarios.pagina_usuarios en la primera página y en la del
+medio de cada listado, sin filtros y con búsqueda por nombre, rol, activo y sus
+combinaciones; junto con el listado anterior (SELECT * de toda la tabla), una
+página con OFFSET a la misma profundidad y la búsqueda del login. Con --plan
+muestra el plan de SQLite de cada consulta del listado.
+Antes de medir comprueba la paginación: recorrer las páginas hacia adelante y
+hacia atrás da todos los usuarios en orden, y un `antes` sin filas previas
+(vacío, o menor que el primer nombre) devuelve la primera página.
+
+Uso (desde la raíz del repositorio):
+    python benchmarks/bench_usuarios.py [--usuarios 1000 10000 100000] [--repeticiones 200] [--plan]
+"""
+import os
+import sys
+import time
+import random
+import string
+import argparse
+import statistics
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import db_local
+import usuarios
+
+ESCENARIOS = {
+    "sin filtros": {},
+    "nombre": {"q": "ma"},
+    "rol admin": {"rol": "admin"},
+    "inactivos": {"activo": "0"},
+    "clientes activos": {"rol": "cliente", "activo": "1"},
+    "nombre + rol": {"q": "ma", "rol": "cliente"},
+}
+
+
+def llenar_base(ruta, cantidad):
+    """Base nueva con `cantidad` usuarios; devuelve la conexión y las filas (nombre, clave, rol, activo)."""
+    for sufijo in ("", "-wal", "-shm"):
+        if os.path.exists(ruta + sufijo):
+            os.remove(ruta + sufijo)
+    aleatorio = random.Random(cantidad)
+    nombres = [
+        "".join(aleatorio.choices(string.ascii_lowercase, k=6)) + str(indice)
+        for indice in range(cantidad)
+    ]
+    filas = [
+        (nombre, "clave", "admin" if aleatorio.random() < 0.05 else "cliente", 0 if aleatorio.random() < 0.1 else 1)
+        for nombre in nombres
+    ]
+    conexion = db_local.conectar(ruta)
+    cursor = conexion.cursor()
+    cursor.executemany("INSERT INTO usuarios (nombre_usuario, contrasena, rol, activo) VALUES (%s, MD5(%s), %s, %s)", filas)
+    conexion.commit()
+    cursor.execute("ANALYZE")
+    cursor.close()
+    return conexion, filas
+
+
+def comprobar_paginacion(cursor, filas):
+    """Lista de errores de la paginación contra los nombres ordenados (vacía si todo cuadra)."""
+    esperados = sorted(nombre for nombre, _, _, _ in filas)
+    filtros = usuarios.leer_filtros({})
+    errores = []
+
+    vistos, despues = [], None
+    while True:
+        pagina, _, hay_siguiente = usuarios.pagina_usuarios(cursor, filtros, despues=despues)
+        vistos += [fila["nombre_usuario"] for fila in pagina]
+        if not hay_siguiente:
+            break
+        despues = pagina[-1]["nombre_usuario"]
+    if vistos != esperados:
+        errores.append("hacia adelante no se recorren todos los usuarios en orden")
+
+    vistos, antes = [], esperados[-1] + "~"
+    while True:
+        pagina, hay_anterior, _ = usuarios.pagina_usuarios(cursor, filtros, antes=antes)
+        vistos[:0] = [fila["nombre_usuario"] for fila in pagina]
+        if not hay_anterior:
+            break
+        antes = pagina[0]["nombre_usuario"]
+    if vistos != esperados:
+        errores.append("hacia atrás no se recorren todos los usuarios en orden")
+
+    primera = usuarios.pagina_usuarios(cursor, filtros)
+    for antes in ("", esperados[0]):
+        if usuarios.pagina_usuarios(cursor, filtros, antes=antes) != primera:
+            errores.append(f"antes={antes!r} no devuelve la primera página")
+    return errores
+
+
+def medir(funcion, repeticiones):
+    """Mediana en µs de `repeticiones` llamadas."""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--usuarios", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeticiones", type=int, default=200)
+    parser.add_argument("--plan", action="store_true", help="Mostrar el plan de SQLite de cada consulta")
+    parser.add_argument("--db", help="Base local; por omisión benchmarks/resultados/usuarios.db (se reinicia)")
+    args = parser.parse_args()
+
+    ruta = args.db or os.path.join(RAIZ, "benchmarks", "resultados", "usuarios.db")
+    os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+
+    resultados = {}
+    for cantidad in args.usuarios:
+        inicio = time.perf_counter()
+        conexion, filas = llenar_base(ruta, cantidad)
+        print(f"{cantidad} usuarios listos en {time.perf_counter() - inicio:.1f} s")
+        cursor = conexion.cursor(dictionary=True)
+        errores = comprobar_paginacion(cursor, filas)
+        if errores:
+            print("ERROR: " + "; ".join(errores))
+            sys.exit(1)
+        columnas = resultados[cantidad] = {}
+
+        for escenario, valores in ESCENARIOS.items():
+            filtros = usuarios.leer_filtros(valores)
+            # La página del medio empieza a la mitad de los usuarios que cumplen los filtros
+            coinciden = sorted(
+                nombre for nombre, _, rol, activo in filas
+                if nombre.startswith(filtros["q"]) and filtros["rol"] in ('', rol) and filtros["activo"] in ('', str(activo))
+            )
+            medio = coinciden[len(coinciden) // 2]
+            for pagina, despues in (("primera", None), ("medio", medio)):
+                columnas[f"{escenario} ({pagina})"] = medir(
+                    lambda: usuarios.pagina_usuarios(cursor, filtros, despues=despues), args.repeticiones
+                )
+            if args.plan:
+                sql, params = usuarios.consulta_pagina(filtros, despues=medio)
+                plano = conexion._db.execute("EXPLAIN QUERY PLAN " + sql.replace("%s", "?"), params).fetchall()
+                print(f"  plan {escenario:<18} {'; '.join(fila[-1] for fila in plano)}")
+
+        # Referencias: el listado anterior y OFFSET a la misma profundidad que la página del medio
+        columnas["SELECT * completo"] = medir(
+            lambda: (cursor.execute("SELECT * FROM usuarios"), cursor.fetchall()), max(1, args.repeticiones // 20)
+        )
+        columnas["OFFSET (medio)"] = medir(
+            lambda: (cursor.execute(
+                f"SELECT {usuarios.COLUMNAS_LISTADO} FROM usuarios ORDER BY nombre_usuario LIMIT %s OFFSET %s",
+                (usuarios.USUARIOS_POR_PAGINA, cantidad // 2),
+            ), cursor.fetchall()),
+            args.repeticiones,
+        )
+        nombre_login = filas[cantidad // 3][0]
+        columnas["login"] = medir(
+            lambda: (cursor.execute(
+                "SELECT id, nombre_usuario, rol FROM usuarios WHERE nombre_usuario = %s AND contrasena = MD5(%s)",
+                (nombre_login, "clave"),
+            ), cursor.fetchone()),
+            args.repeticiones,
+        )
+        cursor.close()
+        conexion.close()
+
+    print()
+    print(f"{'consulta (mediana, µs)':<32}" + "".join(f"{cantidad:>12}" for cantidad in args.usuarios))
+    for consulta in resultados[args.usuarios[0]]:
+        print(f"{consulta:<32}" + "".join(f"{resultados[cantidad][consulta]:12.0f}" for cantidad in args.usuarios))
+
+
+if __name__ == "__main__":
+    main()
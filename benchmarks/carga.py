@@ -0,0 +1,324 @@
+"""Prueba de carga de sesiones y cargas concurrentes.
+
+Cada usuario virtual repite la secuencia login → index → /process_pdf (varias
+veces, con opciones de marco/folio al azar) → logout con su propia cuenta, y al
+final se reporta por ruta: solicitudes, errores, rechazos del control de
+admisión (429, aparte de los errores y de las latencias), rendimiento y latencias
+p50/p95/p99/máx. Con --abusivos se agregan usuarios que, con una sola sesión,
+envían /process_pdf sin pausa (ruta "abuso"): los 429 deben llegar en pocos ms y
+las latencias de los usuarios normales no deben moverse. Los usuarios virtuales
+suben más rápido que una persona: con los límites predeterminados de un cliente
+(1 acta/s tras una ráfaga de 10) parte de sus cargas recibe 429; para medir solo
+la capacidad de render, súbanse con ADMISION_LIMITES.
+
+Por omisión corre dentro del proceso con el cliente de pruebas de Flask y la base
+local (db_local) en lugar de MySQL, así que no necesita servidor. Con --url manda
+solicitudes HTTP reales a un servidor ya levantado (por ejemplo
+`MYSQL_LOCAL_PATH=carga.db python app.py`, preparando antes la base con
+--solo-preparar --db carga.db).
+
+Uso (desde la raíz del repositorio):
+    python benchmarks/carga.py --usuarios 20 --duracion 30
+    python benchmarks/carga.py --usuarios 50 --gevent --subidas 5
+    python benchmarks/carga.py --usuarios 20 --abusivos 5 --pausa 500
+    python benchmarks/carga.py --solo-preparar --db carga.db --usuarios 50
+    python benchmarks/carga.py --url http://localhost:5000 --usuarios 50 --duracion 60
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from datetime import datetime
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+os.chdir(RAIZ)  # Las rutas de las plantillas son relativas a la raíz
+
+CONTRASENA = "carga"
+RUTAS = ("login", "index", "process_pdf", "logout", "abuso")
+
+
+def nombre_usuario(indice):
+    return f"carga{indice:04d}"
+
+
+def preparar_base(ruta, usuarios):
+    """Crea en la base local las cuentas de los usuarios virtuales que falten."""
+    import db_local
+
+    conexion = db_local.conectar(ruta)
+    cursor = conexion.cursor()
+    cursor.execute("SELECT nombre_usuario FROM usuarios WHERE nombre_usuario LIKE %s", ("carga%",))
+    existentes = {fila[0] for fila in cursor.fetchall()}
+    cursor.close()
+    for indice in range(usuarios):
+        if nombre_usuario(indice) not in existentes:
+            db_local.crear_usuario(conexion, nombre_usuario(indice), CONTRASENA)
+    conexion.close()
+
+
+class ClienteLocal:
+    """Usuario virtual sobre el cliente de pruebas de Flask (sin seguir redirecciones)."""
+
+    def __init__(self, app):
+        self._cliente = app.test_client()
+
+    def get(self, ruta):
+        respuesta = self._cliente.get(ruta)
+        return respuesta.status_code, respuesta.headers.get('Location', ''), respuesta.get_data()
+
+    def post(self, ruta, campos, archivo=None):
+        datos = dict(campos)
+        if archivo is not None:
+            from io import BytesIO
+            nombre, contenido = archivo
+            datos['pdf_file'] = (BytesIO(contenido), nombre)
+        respuesta = self._cliente.post(ruta, data=datos, content_type='multipart/form-data')
+        return respuesta.status_code, respuesta.headers.get('Location', ''), respuesta.get_data()
+
+
+class ClienteHttp:
+    """Usuario virtual contra un servidor real, con sus propias cookies."""
+
+    def __init__(self, url):
+        import urllib.request
+        import http.cookiejar
+
+        class SinRedireccion(urllib.request.HTTPRedirectHandler):
+            def redirect_request(self, *args, **kwargs):
+                return None
+
+        self._url = url.rstrip('/')
+        self._abrir = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), SinRedireccion()
+        ).open
+
+    def _enviar(self, solicitud):
+        import urllib.error
+
+        try:
+            with self._abrir(solicitud, timeout=120) as respuesta:
+                return respuesta.status, respuesta.headers.get('Location', ''), respuesta.read()
+        except urllib.error.HTTPError as e:  # También las redirecciones, que no se siguen
+            return e.code, e.headers.get('Location', ''), e.read()
+
+    def get(self, ruta):
+        import urllib.request
+        return self._enviar(urllib.request.Request(self._url + ruta))
+
+    def post(self, ruta, campos, archivo=None):
+        import urllib.request
+
+        frontera = os.urandom(16).hex()
+        partes = []
+        for campo, valor in campos.items():
+            partes.append(f'--{frontera}\r\nContent-Disposition: form-data; name="{campo}"\r\n\r\n{valor}\r\n'.encode())
+        if archivo is not None:
+            nombre, contenido = archivo
+            partes.append(
+                f'--{frontera}\r\nContent-Disposition: form-data; name="pdf_file"; filename="{nombre}"\r\n'
+                f'Content-Type: application/pdf\r\n\r\n'.encode() + contenido + b'\r\n'
+            )
+        partes.append(f'--{frontera}--\r\n'.encode())
+        solicitud = urllib.request.Request(
+            self._url + ruta, data=b''.join(partes), method='POST',
+            headers={'Content-Type': f'multipart/form-data; boundary={frontera}'},
+        )
+        return self._enviar(solicitud)
+
+
+class Registro:
+    """Latencias, errores y rechazos por ruta, compartidos entre usuarios virtuales."""
+
+    def __init__(self):
+        self._datos = {ruta: ([], [0], []) for ruta in RUTAS}
+        self._lock = threading.Lock()
+
+    def anotar(self, ruta, segundos, ok, rechazada=False):
+        with self._lock:
+            tiempos, errores, rechazos = self._datos[ruta]
+            if rechazada:
+                rechazos.append(segundos)
+                return
+            tiempos.append(segundos)
+            errores[0] += not ok
+
+    def resumen(self, duracion):
+        from bench_enmarcado import percentil
+
+        resultados = []
+        for ruta in RUTAS:
+            tiempos, (errores,), rechazos = self._datos[ruta]
+            if not tiempos and not rechazos:
+                continue
+            ordenados = sorted(tiempos)
+            rechazos = sorted(rechazos)
+            resultados.append({
+                "ruta": ruta,
+                "n": len(tiempos),
+                "errores": errores,
+                "tasa_error": errores / len(tiempos) if tiempos else 0.0,
+                "rechazadas": len(rechazos),
+                "rechazo_p99_ms": percentil(rechazos, 99) * 1000,
+                "por_segundo": len(tiempos) / duracion if duracion else 0.0,
+                "p50_ms": percentil(ordenados, 50) * 1000,
+                "p95_ms": percentil(ordenados, 95) * 1000,
+                "p99_ms": percentil(ordenados, 99) * 1000,
+                "max_ms": (ordenados[-1] if ordenados else 0.0) * 1000,
+            })
+        return resultados
+
+
+def medir_paso(registro, ruta, llamada, exito):
+    inicio = time.perf_counter()
+    estado = None
+    try:
+        estado, destino, cuerpo = llamada()
+        ok = exito(estado, destino, cuerpo)
+    except Exception as e:
+        print(f"Error en {ruta}: {e}")
+        ok = False
+    registro.anotar(ruta, time.perf_counter() - inicio, ok, rechazada=estado == 429)
+    return ok
+
+
+def usuario_virtual(indice, cliente, actas, registro, fin, args):
+    """Repite sesiones completas hasta `fin` (o hasta completar --sesiones)."""
+    aleatorio = random.Random(indice)
+    pausa = lambda: time.sleep(aleatorio.uniform(0, args.pausa) / 1000) if args.pausa else None
+    sesiones = 0
+    while time.monotonic() < fin and (not args.sesiones or sesiones < args.sesiones):
+        sesiones += 1
+        entro = medir_paso(
+            registro, "login",
+            lambda: cliente.post('/login', {'username': nombre_usuario(indice), 'password': CONTRASENA}),
+            lambda estado, destino, _: estado == 302 and not destino.rstrip('/').endswith('/login'),
+        )
+        if not entro:
+            pausa()
+            continue
+        pausa()
+        medir_paso(registro, "index", lambda: cliente.get('/'), lambda estado, _, __: estado == 200)
+        for _ in range(args.subidas):
+            pausa()
+            campos = {campo: 'on' for campo in ('front_frame', 'rear_frame', 'folio') if aleatorio.random() < 0.5}
+            acta = aleatorio.choice(actas)
+            medir_paso(
+                registro, "process_pdf",
+                lambda: cliente.post('/process_pdf', campos, acta),
+                lambda estado, _, cuerpo: estado == 200 and cuerpo.startswith(b'%PDF'),
+            )
+        pausa()
+        medir_paso(registro, "logout", lambda: cliente.get('/logout'), lambda estado, _, __: estado == 302)
+
+
+def usuario_abusivo(indice, cliente, actas, registro, fin):
+    """Una sesión que envía /process_pdf sin pausa hasta `fin`."""
+    aleatorio = random.Random(indice)
+    cliente.post('/login', {'username': nombre_usuario(indice), 'password': CONTRASENA})
+    while time.monotonic() < fin:
+        acta = aleatorio.choice(actas)
+        medir_paso(
+            registro, "abuso",
+            lambda: cliente.post('/process_pdf', {'rear_frame': 'on'}, acta),
+            lambda estado, _, cuerpo: estado == 200 and cuerpo.startswith(b'%PDF'),
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--usuarios", type=int, default=10, help="Usuarios virtuales concurrentes")
+    parser.add_argument("--duracion", type=float, default=20, help="Segundos de carga")
+    parser.add_argument("--sesiones", type=int, default=0, help="Sesiones por usuario (0 = hasta agotar la duración)")
+    parser.add_argument("--subidas", type=int, default=3, help="Cargas a /process_pdf por sesión")
+    parser.add_argument("--pausa", type=float, default=0, help="Pausa máxima al azar entre pasos, en ms")
+    parser.add_argument("--abusivos", type=int, default=0, help="Usuarios adicionales que envían /process_pdf sin pausa")
+    parser.add_argument("--gevent", action="store_true", help="Usar greenlets de gevent como en producción (solo en proceso)")
+    parser.add_argument("--url", help="Servidor a probar; sin esto se usa el cliente de pruebas de Flask")
+    parser.add_argument("--db", help="Base local (SQLite) de los usuarios; por omisión benchmarks/resultados/carga.db")
+    parser.add_argument("--solo-preparar", action="store_true", help="Solo crear los usuarios en --db y salir")
+    parser.add_argument("--salida", help="Archivo JSON donde guardar los resultados")
+    args = parser.parse_args()
+
+    if args.gevent and not args.url:
+        from gevent import monkey
+        monkey.patch_all()
+
+    db = args.db or os.path.join(RAIZ, "benchmarks", "resultados", "carga.db")
+    os.makedirs(os.path.dirname(os.path.abspath(db)), exist_ok=True)
+    if not args.url or args.solo_preparar:
+        preparar_base(db, args.usuarios + args.abusivos)
+    if args.solo_preparar:
+        print(f"{args.usuarios + args.abusivos} usuarios listos en {db}")
+        return
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from bench_enmarcado import actas_sinteticas
+
+    actas = actas_sinteticas()
+    if args.url:
+        clientes = [ClienteHttp(args.url) for _ in range(args.usuarios + args.abusivos)]
+    else:
+        os.environ['MYSQL_LOCAL_PATH'] = db
+        from app import app
+        from enmarcado import warm_up
+        warm_up()
+        clientes = [ClienteLocal(app) for _ in range(args.usuarios + args.abusivos)]
+
+    registro = Registro()
+    inicio = time.monotonic()
+    fin = inicio + args.duracion
+    hilos = [
+        threading.Thread(target=usuario_virtual, args=(indice, cliente, actas, registro, fin, args), daemon=True)
+        if indice < args.usuarios else
+        threading.Thread(target=usuario_abusivo, args=(indice, cliente, actas, registro, fin), daemon=True)
+        for indice, cliente in enumerate(clientes)
+    ]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    duracion = time.monotonic() - inicio
+
+    resultados = registro.resumen(duracion)
+    print(
+        f"{args.usuarios} usuarios" + (f" + {args.abusivos} abusivos" if args.abusivos else "")
+        + f", {duracion:.1f} s" + (" (gevent)" if args.gevent and not args.url else "")
+    )
+    for r in resultados:
+        print(
+            f"{r['ruta']:<12} n={r['n']:<6} errores {r['errores']:<4} ({r['tasa_error']:.1%})  {r['por_segundo']:7.1f}/s"
+            f"  p50 {r['p50_ms']:8.1f}  p95 {r['p95_ms']:8.1f}  p99 {r['p99_ms']:8.1f}  máx {r['max_ms']:8.1f} ms"
+            + (f"  429: {r['rechazadas']} (p99 {r['rechazo_p99_ms']:.1f} ms)" if r['rechazadas'] else "")
+        )
+    pool = admision = None
+    if not args.url:
+        from basedatos import obtener_pool
+        import admision as control_admision
+        pool = obtener_pool().metricas()
+        admision = control_admision.estadisticas()["resultados"]
+        print(f"Pool de conexiones: {pool}")
+        print(f"Admisión: {admision}")
+
+    if args.salida:
+        with open(args.salida, "w") as archivo:
+            json.dump({
+                "fecha": datetime.now().isoformat(timespec="seconds"),
+                "url": args.url,
+                "usuarios": args.usuarios,
+                "abusivos": args.abusivos,
+                "duracion": duracion,
+                "subidas": args.subidas,
+                "gevent": args.gevent,
+                "resultados": resultados,
+                "pool_db": pool,
+                "admision": admision,
+            }, archivo, indent=2, ensure_ascii=False)
+        print(f"Resultados guardados en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
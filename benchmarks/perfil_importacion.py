@@ -0,0 +1,110 @@
+"""Perfil del arranque: tiempo de importación por paquete y latencia de la primera acta.
+
+Cada medición corre en un intérprete nuevo. Se reporta cuánto tarda `import app`,
+qué paquetes se llevan ese tiempo (según `python -X importtime`, sumando el tiempo
+propio de cada módulo por paquete de primer nivel) y cuánto tarda la primera acta
+(delantero + trasero + folio) con y sin el calentamiento de enmarcado.warm_up,
+junto con la segunda para comparar.
+
+Uso (desde la raíz del repositorio):
+    python benchmarks/perfil_importacion.py [--repeticiones 5] [--top 20] [--salida arranque.json]
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+from collections import Counter
+from datetime import datetime
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Se ejecuta en el proceso hijo; la última línea de la salida es el JSON con los tiempos
+MEDICION = """
+import os, sys, time, json
+from io import BytesIO
+inicio = time.perf_counter()
+import app
+importacion = time.perf_counter() - inicio
+import enmarcado
+calentamiento = 0.0
+if {calentar}:
+    inicio = time.perf_counter()
+    enmarcado.warm_up()
+    calentamiento = time.perf_counter() - inicio
+sys.path.insert(0, os.path.join(os.getcwd(), "benchmarks"))
+from bench_enmarcado import acta_sintetica
+from werkzeug.datastructures import FileStorage
+actas = []
+for indice in range(2):
+    nombre, datos = acta_sintetica("JC", indice)
+    inicio = time.perf_counter()
+    enmarcado.overlay_pdf_on_background(FileStorage(BytesIO(datos), filename=nombre), BytesIO(), True, True, True)
+    actas.append(time.perf_counter() - inicio)
+print(json.dumps({{"importacion": importacion, "calentamiento": calentamiento, "primera": actas[0], "segunda": actas[1]}}))
+"""
+
+
+def correr(calentar):
+    # Los folios de la primera acta salen de una base local desechable
+    os.makedirs(os.path.join(RAIZ, "benchmarks", "resultados"), exist_ok=True)
+    entorno = dict(os.environ, MYSQL_LOCAL_PATH=os.path.join(RAIZ, "benchmarks", "resultados", "bench.db"))
+    salida = subprocess.run(
+        [sys.executable, "-c", MEDICION.format(calentar=calentar)],
+        cwd=RAIZ, env=entorno, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(salida.strip().splitlines()[-1])
+
+
+def tiempos_por_paquete():
+    """Tiempo propio de importación (ms) sumado por paquete de primer nivel, para `import app`."""
+    salida = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=RAIZ, capture_output=True, text=True, check=True,
+    ).stderr
+    paquetes = Counter()
+    for linea in salida.splitlines():
+        if not linea.startswith("import time:") or "self [us]" in linea:
+            continue
+        propio, _, modulo = linea[len("import time:"):].split("|")
+        paquetes[modulo.strip().split(".")[0]] += int(propio) / 1000
+    return paquetes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeticiones", type=int, default=5, help="Intérpretes nuevos por modo")
+    parser.add_argument("--top", type=int, default=20, help="Paquetes a mostrar")
+    parser.add_argument("--salida", help="Archivo JSON donde guardar los resultados")
+    args = parser.parse_args()
+
+    paquetes = tiempos_por_paquete()
+    print(f"Importación de app por paquete (tiempo propio, total {sum(paquetes.values()):.0f} ms):")
+    for paquete, ms in paquetes.most_common(args.top):
+        print(f"  {paquete:<24} {ms:8.1f} ms")
+
+    modos = {}
+    for calentar in (False, True):
+        corridas = [correr(calentar) for _ in range(args.repeticiones)]
+        modo = "con_calentamiento" if calentar else "sin_calentamiento"
+        modos[modo] = {campo: statistics.median(c[campo] for c in corridas) * 1000 for campo in corridas[0]}
+        m = modos[modo]
+        print(
+            f"{modo:<18} import app {m['importacion']:7.1f}  calentamiento {m['calentamiento']:7.1f}"
+            f"  primera acta {m['primera']:7.1f}  segunda {m['segunda']:7.1f} ms (mediana de {args.repeticiones})"
+        )
+
+    if args.salida:
+        with open(args.salida, "w") as archivo:
+            json.dump({
+                "fecha": datetime.now().isoformat(timespec="seconds"),
+                "python": sys.version.split()[0],
+                "paquetes_ms": dict(paquetes.most_common()),
+                "modos_ms": modos,
+            }, archivo, indent=2, ensure_ascii=False)
+        print(f"Resultados guardados en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import threading
+from collections import OrderedDict
+
+
+class CacheLRU:
+    """Caché LRU en memoria acotada por número de entradas y por bytes, con contadores."""
+
+    def __init__(self, max_entradas, max_bytes):
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self._datos = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+
+    def obtener(self, clave):
+        """Devuelve el valor guardado para `clave` (y lo marca como reciente) o None."""
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                self.fallos += 1
+                return None
+            self._datos.move_to_end(clave)
+            self.aciertos += 1
+            return entrada[0]
+
+    def guardar(self, clave, valor, tamano):
+        """Guarda `valor` ocupando `tamano` bytes; desaloja las entradas menos usadas si hace falta."""
+        if tamano > self.max_bytes or self.max_entradas <= 0:
+            return
+        with self._lock:
+            anterior = self._datos.pop(clave, None)
+            if anterior is not None:
+                self._bytes -= anterior[1]
+            self._datos[clave] = (valor, tamano)
+            self._bytes += tamano
+            while len(self._datos) > self.max_entradas or self._bytes > self.max_bytes:
+                _, (_, tamano_desalojado) = self._datos.popitem(last=False)
+                self._bytes -= tamano_desalojado
+                self.desalojos += 1
+
+    def invalidar(self, clave):
+        """Elimina la entrada de `clave` si existe."""
+        with self._lock:
+            entrada = self._datos.pop(clave, None)
+            if entrada is not None:
+                self._bytes -= entrada[1]
+
+    def limpiar(self):
+        """Vacía la caché sin reiniciar los contadores."""
+        with self._lock:
+            self._datos.clear()
+            self._bytes = 0
+
+    def estadisticas(self):
+        """Contadores para monitoreo."""
+        with self._lock:
+            return {
+                "entradas": len(self._datos),
+                "bytes": self._bytes,
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "desalojos": self.desalojos,
+            }
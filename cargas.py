@@ -0,0 +1,80 @@
+import os
+import hashlib
+import tempfile
+from io import BytesIO
+
+import fitz  # PyMuPDF para manejar PDFs
+from flask import Request
+
+# Manejo de los archivos subidos sin copias completas en memoria.
+# Werkzeug guarda cada archivo en un SpooledTemporaryFile y `read()` copia todo su
+# contenido a un bytes de Python, que PyMuPDF conserva mientras el documento está
+# abierto. Aquí las cargas pequeñas quedan en un BytesIO (getvalue() comparte su
+# buffer sin copiarlo) y las grandes en un temporal con nombre que PyMuPDF lee
+# directamente del disco; el hash para la caché se calcula por bloques.
+# Los cuerpos demasiado grandes y los archivos que no empiezan como PDF se
+# rechazan antes de abrirlos.
+
+CARGA_MAX_BYTES = int(os.getenv("CARGA_MAX_BYTES", str(16 * 1024 * 1024)))  # Por archivo
+SOLICITUD_MAX_BYTES = int(os.getenv("SOLICITUD_MAX_BYTES", str(256 * 1024 * 1024)))  # Cuerpo completo (lotes)
+CARGA_EN_MEMORIA_BYTES = 500 * 1024  # Cargas de hasta este tamaño se quedan en memoria
+CARGAS_DIR = os.getenv("CARGAS_DIR") or None  # Directorio de los temporales (None: el del sistema)
+ENCABEZADO_PDF = b"%PDF-"
+VENTANA_ENCABEZADO = 1024  # Los lectores aceptan el encabezado dentro del primer KB
+
+
+class SolicitudCargas(Request):
+    """Request que guarda las cargas grandes en un temporal con nombre en lugar de uno anónimo."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if total_content_length is not None and total_content_length <= CARGA_EN_MEMORIA_BYTES:
+            return BytesIO()
+        return tempfile.NamedTemporaryFile("wb+", dir=CARGAS_DIR, prefix="carga_", suffix=".pdf")
+
+
+def solicitud_excedida(request, limite=CARGA_MAX_BYTES):
+    """True si el Content-Length declarado ya supera el límite (no lee el cuerpo)."""
+    return request.content_length is not None and request.content_length > limite
+
+
+def rechazo_contenido(tamano, inicio):
+    """Motivo de rechazo según el tamaño y el primer KB del archivo, como (mensaje, código HTTP), o None."""
+    if tamano > CARGA_MAX_BYTES:
+        return "El archivo excede el tamaño permitido.", 413
+    if ENCABEZADO_PDF not in inicio[:VENTANA_ENCABEZADO]:
+        return "El archivo no es un PDF.", 415
+    return None
+
+
+def rechazo_carga(pdf_file):
+    """Motivo para rechazar la carga antes de abrirla, como (mensaje, código HTTP), o None."""
+    stream = pdf_file.stream
+    posicion = stream.tell()
+    stream.seek(0, os.SEEK_END)
+    tamano = stream.tell()
+    stream.seek(0)
+    inicio = stream.read(VENTANA_ENCABEZADO)
+    stream.seek(posicion)
+    return rechazo_contenido(tamano, inicio)
+
+
+def huella(pdf_file):
+    """sha256 del contenido sin copiarlo completo (buffer del BytesIO o lectura por bloques)."""
+    stream = pdf_file.stream
+    stream.seek(0)
+    digest = hashlib.file_digest(stream, "sha256").hexdigest()
+    stream.seek(0)
+    return digest
+
+
+def abrir_pdf(pdf_file):
+    """Abre la carga con PyMuPDF desde el temporal en disco o desde el buffer en memoria."""
+    stream = pdf_file.stream
+    if isinstance(stream, BytesIO):
+        return fitz.open(stream=stream.getvalue(), filetype="pdf")
+    ruta = getattr(stream, "name", None)
+    if isinstance(ruta, str):
+        stream.flush()
+        return fitz.open(ruta, filetype="pdf")
+    stream.seek(0)
+    return fitz.open(stream=stream.read(), filetype="pdf")
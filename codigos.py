@@ -0,0 +1,181 @@
+import os
+import threading
+import fitz  # PyMuPDF para manejar PDFs
+from cache_lru import CacheLRU
+
+# Generación de los códigos (QR y código de barras del folio) que se estampan en las actas.
+# Los QR se construyen directamente desde la matriz de módulos a un Pixmap en
+# escala de grises, sin pasar por PIL ni por una codificación PNG intermedia, y se
+# guardan en una caché LRU porque es común reimprimir la misma acta.
+# En modo vectorial el QR se dibuja como rectángulos (módulos contiguos unidos por
+# fila) en un documento de una página que se muestra como Form XObject; PyMuPDF
+# reutiliza ese XObject dentro del mismo documento, así que estampar el QR dos
+# veces no agrega bytes. Los operadores del QR vectorial también se guardan solos
+# para llenar el lugar reservado del QR en los esqueletos de enmarcado.
+# El código de barras Code128 se dibuja como rectángulos vectoriales directamente
+# en la página: no hay SVG, expresiones regulares ni rasterización de por medio.
+# qrcode y barcode se importan en el primer uso (el calentamiento del proceso los
+# carga antes de aceptar tráfico), así importar la aplicación no paga su costo.
+
+QR_BOX_SIZE = 10  # Pixeles por módulo
+QR_CACHE_MAX_ENTRADAS = int(os.getenv("QR_CACHE_MAX_ENTRADAS", "512"))
+QR_CACHE_MAX_BYTES = int(os.getenv("QR_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+# "vectorial" dibuja los módulos en el contenido de la página; "imagen" inserta el Pixmap
+QR_MODO = os.getenv("QR_MODO", "vectorial")
+BARCODE_QUIET_ZONE = 10  # Módulos de margen a cada lado (mínimo del estándar Code128)
+BARCODE_MODULE_PX = 3  # Pixeles por módulo en la versión raster
+BARCODE_HEIGHT_PX = 40
+
+_NEGRO = b"\x00"
+_BLANCO = b"\xff"
+
+qr_cache = CacheLRU(QR_CACHE_MAX_ENTRADAS, QR_CACHE_MAX_BYTES)
+qr_vector_cache = CacheLRU(QR_CACHE_MAX_ENTRADAS, QR_CACHE_MAX_BYTES)
+qr_operadores_cache = CacheLRU(QR_CACHE_MAX_ENTRADAS, QR_CACHE_MAX_BYTES)
+
+
+def qr_matrix(text):
+    """Matriz de módulos del QR (True = módulo oscuro), sin margen."""
+    import qrcode
+
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=QR_BOX_SIZE,
+        border=0,
+    )
+    qr.add_data(text)
+    qr.make(fit=True)
+    return qr.get_matrix()
+
+
+def matrix_to_pixmap(matrix, box_size=QR_BOX_SIZE):
+    """Convierte la matriz de módulos en un Pixmap en escala de grises de PyMuPDF."""
+    negro = _NEGRO * box_size
+    blanco = _BLANCO * box_size
+    filas = []
+    for fila in matrix:
+        filas.append(b"".join(negro if modulo else blanco for modulo in fila) * box_size)
+    lado = len(matrix) * box_size
+    return fitz.Pixmap(fitz.csGRAY, lado, lado, b"".join(filas), False)
+
+
+def generate_qr_code(text):
+    """Genera (o toma de la caché) el código QR de `text` como Pixmap de PyMuPDF."""
+    pixmap = qr_cache.obtener(text)
+    if pixmap is None:
+        pixmap = matrix_to_pixmap(qr_matrix(text))
+        qr_cache.guardar(text, pixmap, pixmap.size)
+    return pixmap
+
+
+def qr_runs(matrix):
+    """Agrupa los módulos oscuros de cada fila en tramos: lista de (fila, columna inicial, ancho)."""
+    runs = []
+    for fila, modulos in enumerate(matrix):
+        inicio = None
+        for columna, modulo in enumerate(modulos):
+            if modulo and inicio is None:
+                inicio = columna
+            elif not modulo and inicio is not None:
+                runs.append((fila, inicio, columna - inicio))
+                inicio = None
+        if inicio is not None:
+            runs.append((fila, inicio, len(modulos) - inicio))
+    return runs
+
+
+def qr_operadores(text):
+    """Lado del QR en módulos y rectángulos `re` de sus tramos oscuros (un punto por módulo)."""
+    entrada = qr_operadores_cache.obtener(text)
+    if entrada is None:
+        matrix = qr_matrix(text)
+        lado = len(matrix)
+        # Coordenadas PDF directas: el origen está abajo, por eso se invierte la fila
+        operadores = "".join(f"{columna} {lado - fila - 1} {ancho} 1 re\n" for fila, columna, ancho in qr_runs(matrix))
+        entrada = (lado, operadores)
+        qr_operadores_cache.guardar(text, entrada, len(operadores))
+    return entrada
+
+
+def qr_vector_document(text):
+    """Documento de una página (un punto por módulo) con el QR vectorial de `text`, y su candado."""
+    entrada = qr_vector_cache.obtener(text)
+    if entrada is None:
+        lado, operadores = qr_operadores(text)
+        doc = fitz.open()
+        page = doc.new_page(width=lado, height=lado)
+        shape = page.new_shape()
+        shape.draw_cont = operadores
+        shape.finish(color=None, fill=(0, 0, 0), width=0)
+        shape.commit()
+        entrada = (doc, threading.Lock())
+        qr_vector_cache.guardar(text, entrada, len(operadores))
+    return entrada
+
+
+def draw_qr(page, rect, text):
+    """Estampa el QR de `text` en `rect`, como vector o como imagen según QR_MODO."""
+    if QR_MODO == "imagen":
+        page.insert_image(rect, pixmap=generate_qr_code(text))
+        return
+    doc, lock = qr_vector_document(text)
+    with lock:
+        page.show_pdf_page(rect, doc, 0)
+
+
+def qr_cache_stats():
+    """Aciertos, fallos y ocupación de las cachés de QR (imagen, vectorial y operadores)."""
+    return {
+        "imagen": qr_cache.estadisticas(),
+        "vectorial": qr_vector_cache.estadisticas(),
+        "operadores": qr_operadores_cache.estadisticas(),
+    }
+
+
+def barcode_modules(text):
+    """Patrón de módulos Code128 de `text` ('1' = barra, '0' = espacio), con inicio, checksum y fin."""
+    from barcode import Code128
+
+    return Code128(text).build()[0]
+
+
+def barcode_bars(modules):
+    """Agrupa los módulos en barras: lista de (módulo inicial, ancho en módulos)."""
+    bars = []
+    inicio = None
+    for indice, modulo in enumerate(modules):
+        if modulo == "1" and inicio is None:
+            inicio = indice
+        elif modulo == "0" and inicio is not None:
+            bars.append((inicio, indice - inicio))
+            inicio = None
+    if inicio is not None:
+        bars.append((inicio, len(modules) - inicio))
+    return bars
+
+
+def draw_barcode(page, rect, text, color=(0, 0, 0)):
+    """Dibuja el Code128 de `text` como barras vectoriales que ocupan `rect` (con zona de silencio)."""
+    modules = barcode_modules(text)
+    module_width = rect.width / (len(modules) + 2 * BARCODE_QUIET_ZONE)
+    x0 = rect.x0 + BARCODE_QUIET_ZONE * module_width
+    # Se escriben los operadores `re` directamente: Shape.draw_rect es ~3 veces más lento
+    a_pdf = ~page.transformation_matrix  # Coordenadas de página → espacio PDF
+    operadores = []
+    for inicio, ancho in barcode_bars(modules):
+        bar = fitz.Rect(x0 + inicio * module_width, rect.y0, x0 + (inicio + ancho) * module_width, rect.y1) * a_pdf
+        operadores.append(f"{bar.x0:g} {bar.y0:g} {bar.width:g} {bar.height:g} re\n")
+    shape = page.new_shape()
+    shape.draw_cont = "".join(operadores)
+    shape.finish(color=None, fill=color, width=0)
+    shape.commit(overlay=True)
+
+
+def generate_barcode(text):
+    """Genera el Code128 de `text` sin texto como Pixmap en escala de grises de PyMuPDF."""
+    modules = "0" * BARCODE_QUIET_ZONE + barcode_modules(text) + "0" * BARCODE_QUIET_ZONE
+    negro = _NEGRO * BARCODE_MODULE_PX
+    blanco = _BLANCO * BARCODE_MODULE_PX
+    fila = b"".join(negro if modulo == "1" else blanco for modulo in modules)
+    return fitz.Pixmap(fitz.csGRAY, len(modules) * BARCODE_MODULE_PX, BARCODE_HEIGHT_PX, fila * BARCODE_HEIGHT_PX, False)
@@ -0,0 +1,139 @@
+import re
+import sqlite3
+import hashlib
+
+# Sustituto local de MySQL para pruebas y mediciones (pool, pruebas de carga).
+# Imita la parte de mysql.connector que usa la aplicación: cursor(dictionary=True),
+# parámetros con %s, MD5(), commit/rollback, ping e in_transaction; los datos viven
+# en un archivo SQLite que pueden compartir varios procesos.
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS usuarios (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nombre_usuario TEXT NOT NULL COLLATE NOCASE,  -- Como la collation _ci de MySQL
+    contrasena TEXT NOT NULL,
+    rol TEXT NOT NULL DEFAULT 'cliente',
+    activo INTEGER NOT NULL DEFAULT 1,
+    session_token TEXT
+);
+-- Igual que migraciones/002_usuarios.sql
+CREATE UNIQUE INDEX IF NOT EXISTS uq_usuarios_nombre ON usuarios (nombre_usuario);
+CREATE INDEX IF NOT EXISTS idx_usuarios_rol ON usuarios (rol, nombre_usuario);
+CREATE INDEX IF NOT EXISTS idx_usuarios_activo ON usuarios (activo, nombre_usuario);
+-- Igual que migraciones/001_folios.sql
+CREATE TABLE IF NOT EXISTS folio_secuencia (
+    serie TEXT NOT NULL PRIMARY KEY,
+    siguiente INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO folio_secuencia (serie, siguiente) VALUES ('A30', 1000000);
+CREATE TABLE IF NOT EXISTS folios_emitidos (
+    serie TEXT NOT NULL,
+    folio INTEGER NOT NULL,
+    nombre_acta TEXT NOT NULL,
+    user_id INTEGER,
+    emitido TEXT NOT NULL,
+    PRIMARY KEY (serie, folio)
+);
+CREATE INDEX IF NOT EXISTS idx_folios_emitidos_user ON folios_emitidos (user_id, emitido);
+CREATE TRIGGER IF NOT EXISTS folios_emitidos_sin_cambios BEFORE UPDATE ON folios_emitidos
+BEGIN SELECT RAISE(ABORT, 'folios_emitidos solo admite inserciones'); END;
+CREATE TRIGGER IF NOT EXISTS folios_emitidos_sin_borrado BEFORE DELETE ON folios_emitidos
+BEGIN SELECT RAISE(ABORT, 'folios_emitidos solo admite inserciones'); END;
+"""
+
+_PARAMETRO = re.compile(r"%s")
+
+
+def _md5(valor):
+    return None if valor is None else hashlib.md5(str(valor).encode('utf-8')).hexdigest()
+
+
+class CursorLocal:
+    """Cursor con la interfaz de mysql.connector sobre sqlite3."""
+
+    def __init__(self, conexion, dictionary=False):
+        self._cursor = conexion.cursor()
+        self._dictionary = dictionary
+
+    def execute(self, sql, params=()):
+        self._cursor.execute(_PARAMETRO.sub("?", sql), params)
+
+    def executemany(self, sql, filas):
+        self._cursor.executemany(_PARAMETRO.sub("?", sql), filas)
+
+    def _fila(self, fila):
+        if fila is None or not self._dictionary:
+            return fila
+        return {columna[0]: valor for columna, valor in zip(self._cursor.description, fila)}
+
+    def fetchone(self):
+        return self._fila(self._cursor.fetchone())
+
+    def fetchall(self):
+        return [self._fila(fila) for fila in self._cursor.fetchall()]
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    def close(self):
+        self._cursor.close()
+
+
+class ConexionLocal:
+    """Conexión con la interfaz de mysql.connector sobre un archivo SQLite."""
+
+    def __init__(self, ruta):
+        self._db = sqlite3.connect(ruta, timeout=30, check_same_thread=False)
+        self._db.create_function("MD5", 1, _md5, deterministic=True)
+        self._db.execute("PRAGMA journal_mode=WAL")
+
+    def cursor(self, dictionary=False):
+        return CursorLocal(self._db, dictionary=dictionary)
+
+    @property
+    def in_transaction(self):
+        return self._db.in_transaction
+
+    def commit(self):
+        self._db.commit()
+
+    def rollback(self):
+        self._db.rollback()
+
+    def ping(self, reconnect=False):
+        self._db.execute("SELECT 1")
+
+    def is_connected(self):
+        try:
+            self.ping()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def close(self):
+        self._db.close()
+
+
+def conectar(ruta):
+    """Abre una conexión local creando el esquema si hace falta."""
+    conexion = ConexionLocal(ruta)
+    conexion._db.executescript(ESQUEMA)
+    return conexion
+
+
+def crear_usuario(conexion, nombre_usuario, contrasena, rol='cliente', activo=1):
+    """Inserta un usuario (contraseña en MD5 como en la base real) y devuelve su id."""
+    cursor = conexion.cursor()
+    cursor.execute(
+        "INSERT INTO usuarios (nombre_usuario, contrasena, rol, activo) VALUES (%s, MD5(%s), %s, %s)",
+        (nombre_usuario, contrasena, rol, activo),
+    )
+    conexion.commit()
+    user_id = cursor.lastrowid
+    cursor.close()
+    return user_id
@@ -1,20 +1,25 @@
-from flask import Flask, render_template, request, send_file, jsonify, Blueprint, redirect, session
+from flask import request, send_file, jsonify, Blueprint, session, Response, stream_with_context, url_for
+from werkzeug.datastructures import FileStorage
+from werkzeug.exceptions import HTTPException
 import fitz  # PyMuPDF para manejar PDFs
-import qrcode
 import os
+import shutil
+import tempfile
 from io import BytesIO
-from PIL import Image  # Importar la biblioteca Pillow
-from datetime import datetime  # Para manejar fechas y horas
-import pytz  # Para manejar zonas horarias
-import random  # Para generar el número aleatorio
-from barcode import Code128
-from barcode.writer import ImageWriter
-
-# Inicialización de la aplicación
-app = Flask(__name__)
-
-# Configuración para el tamaño máximo de archivos (16 MB)
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16 MB
+import threading
+import time
+from plantillas import obtener_plantilla, precargar_plantillas
+import codigos
+from codigos import generate_qr_code, generate_barcode, draw_barcode, draw_qr
+from cache_lru import CacheLRU
+from metricas import medir, trazar
+import cargas
+import folios
+import estados
+from estados import ESTADOS
+import lotes
+import trabajos
+import admision
 
 # Crear el Blueprint para las funcionalidades de enmarcado
 enmarcado_bp = Blueprint('enmarcado', __name__, url_prefix='/')
@@ -22,296 +27,509 @@ enmarcado_bp = Blueprint('enmarcado', __name__, url_prefix='/')
 # Constantes
 BACKGROUND_PDF_PATH = "static/marcoparaactas.pdf"
 MARCOS_FOLDER = "static/marcostraceros"
-
-# Diccionario de abreviaturas y estados
-ESTADOS = {
-    "AS": "AGUASCALIENTES", "BC": "BAJA CALIFORNIA", "BS": "BAJA CALIFORNIA SUR", "CC": "CAMPECHE",
-    "CL": "COAHUILA", "CM": "COLIMA", "CS": "CHIAPAS", "CH": "CHIHUAHUA", "DF": "DISTRITO FEDERAL",
-    "DG": "DURANGO", "GT": "GUANAJUATO", "GR": "GUERRERO", "HG": "HIDALGO", "JC": "JALISCO",
-    "MC": "MÉXICO", "MN": "MICHOACÁN", "MS": "MORELOS", "NT": "NAYARIT", "NL": "NUEVO LEÓN",
-    "OC": "OAXACA", "PL": "PUEBLA", "QT": "QUERÉTARO", "QR": "QUINTANA ROO", "SP": "SAN LUIS POTOSÍ",
-    "SL": "SINALOA", "SR": "SONORA", "TC": "TABASCO", "TS": "TAMAULIPAS", "TL": "TLAXCALA",
-    "VZ": "VERACRUZ", "YN": "YUCATÁN", "ZS": "ZACATECAS", "NE": "NACIDO EN EL EXTRANJERO"
+# Perfiles de guardado del PDF generado (por despliegue con ENMARCADO_PERFIL_GUARDADO o por
+# solicitud con el campo `perfil`). Los flujos de objetos (use_objstms) reducen el tamaño y,
+# con estas actas, también el tiempo de guardado; el peso lo ponen las imágenes de los
+# marcos, que ya vienen comprimidas.
+SAVE_PROFILES = {
+    # Menor latencia: solo descarta objetos sin uso
+    "rapido": {"garbage": 1, "use_objstms": 1},
+    # Menor tamaño: elimina objetos duplicados y comprime los flujos nuevos
+    "compacto": {"garbage": 3, "deflate": True, "use_objstms": 1},
+    # Sin flujos de objetos, para lectores anteriores a PDF 1.5
+    "compatible": {"garbage": 3, "deflate": True},
 }
+DEFAULT_SAVE_PROFILE = os.getenv("ENMARCADO_PERFIL_GUARDADO", "compacto")
+if DEFAULT_SAVE_PROFILE not in SAVE_PROFILES:
+    raise ValueError(f"ENMARCADO_PERFIL_GUARDADO debe ser uno de: {', '.join(SAVE_PROFILES)}")
+# Caché de salida para reenvíos de la misma acta con las mismas opciones
+SALIDA_CACHE_MAX_ENTRADAS = int(os.getenv("SALIDA_CACHE_MAX_ENTRADAS", "200"))
+SALIDA_CACHE_MAX_BYTES = int(os.getenv("SALIDA_CACHE_MAX_BYTES", str(128 * 1024 * 1024)))
+output_cache = CacheLRU(SALIDA_CACHE_MAX_ENTRADAS, SALIDA_CACHE_MAX_BYTES)
+# Estado detectado por hash de la carga cuando el nombre no trae CURP ("" si no se reconoció)
+state_cache = CacheLRU(int(os.getenv("ESTADO_CACHE_MAX_ENTRADAS", "4096")), 4096 * 64)
+# Vistas previas: una página del acta enmarcada como imagen de baja resolución, sin
+# guardar el PDF. Las cargas quedan un rato por hash para que, al cambiar las opciones,
+# la página mande solo el hash; las imágenes se guardan por hash, nombre y opciones.
+PREVIEW_DPI = int(os.getenv("VISTA_PREVIA_DPI", "40"))
+PREVIEW_DPI_RANGE = (10, 100)
+PREVIEW_FORMATS = {"png": "image/png", "webp": "image/webp"}
+PREVIEW_COST = 0.25  # Fichas de admisión por vista previa: se piden al marcar cada casilla
+preview_cache = CacheLRU(int(os.getenv("VISTA_PREVIA_CACHE_MAX_ENTRADAS", "512")), 32 * 1024 * 1024)
+preview_uploads = CacheLRU(int(os.getenv("VISTA_PREVIA_CARGAS_MAX", "32")), 128 * 1024 * 1024)
+
+def state_frame_path(state_abbr):
+    """Ruta del marco trasero correspondiente a la abreviatura del estado."""
+    return os.path.join(MARCOS_FOLDER, f"{state_abbr}.pdf")
+
+# Índice abreviatura → ruta de los marcos traseros que existen, armado al arrancar;
+# los estados sin marco se resuelven sin consultar el sistema de archivos
+_state_index = None
+
+def build_state_index():
+    """Carga los marcos de todos los estados e indexa los que existen. Devuelve cuántos."""
+    global _state_index
+    _state_index = {
+        abbr: state_frame_path(abbr) for abbr in ESTADOS if obtener_plantilla(state_frame_path(abbr)) is not None
+    }
+    return len(_state_index)
+
+def state_frame_template(state_abbr):
+    """Plantilla del marco trasero del estado, o None si el estado no tiene marco."""
+    if _state_index is None:
+        build_state_index()
+    ruta = _state_index.get(state_abbr)
+    return obtener_plantilla(ruta) if ruta is not None else None
 
-# Definir la zona horaria de México
-mexico_timezone = pytz.timezone('America/Mexico_City')
-
-# Funciones auxiliares
-def is_within_working_hours():
-    """Verifica si la hora actual está dentro del horario de trabajo."""
-    # Obtener la hora actual en UTC y convertirla a la zona horaria de México
-    now = datetime.now(pytz.utc).astimezone(mexico_timezone)
-    
-    # Imprimir la hora actual del servidor en la zona horaria de México
-    print(f"Hora actual del servidor (Hora México): {now.strftime('%Y-%m-%d %H:%M:%S')}")
-
-    # Definir el horario de trabajo (9 AM a 5 PM)
-    start_time = now.replace(hour=0, minute=0, second=0, microsecond=0)
-    end_time = now.replace(hour=23, minute=59, second=59, microsecond=0)
-
-    # Verificar si la hora actual está dentro del horario permitido
-    return start_time <= now <= end_time
-
-def generate_qr_code(text):
-    """Genera un código QR en memoria y devuelve un objeto Pixmap de PyMuPDF."""
-    qr = qrcode.QRCode(
-        version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_L,
-        box_size=10,
-        border=0,
+def preload_templates():
+    """Carga el marco delantero, los marcos de todos los estados y los esqueletos de cada combinación."""
+    inicio = time.perf_counter()
+    cargadas = precargar_plantillas([BACKGROUND_PDF_PATH]) + build_state_index()
+    combinaciones = preload_skeletons()
+    print(f"Plantillas listas: {cargadas} marcos y {combinaciones} esqueletos en {(time.perf_counter() - inicio) * 1000:.0f} ms")
+    return cargadas
+
+def warm_up():
+    """Deja el proceso listo antes de aceptar tráfico: plantillas, esqueletos, zona horaria, fuentes, QR y código de barras."""
+    inicio = time.perf_counter()
+    preload_templates()
+    admision.dentro_de_horario()
+    try:
+        folios.preparar_folios()
+    except Exception as e:
+        print(f"No se pudo reservar el primer bloque de folios: {e}")
+    # Un acta de prueba en un documento desechable: carga la fuente del folio, importa
+    # qrcode y barcode, extrae el texto como la detección del estado y recorre el
+    # guardado con el perfil predeterminado
+    with fitz.open() as doc:
+        page = doc.new_page()
+        stamp_folio(doc, 0)  # Folio de muestra: no se emite ni se registra
+        _stamp_qr_codes(page, "calentamiento")
+        estados.estado_de_documento(doc)
+        doc.tobytes(**SAVE_PROFILES[DEFAULT_SAVE_PROFILE])
+    print(f"Proceso listo en {(time.perf_counter() - inicio) * 1000:.0f} ms")
+
+def detect_state(digest, filename, pdf_file):
+    """Abreviatura del estado del acta: CURP del nombre, capa de texto (en caché por hash) o posición en el nombre."""
+    state_abbr = estados.estado_de_curp(filename)
+    if state_abbr is not None:
+        return state_abbr
+    state_abbr = state_cache.obtener(digest)
+    if state_abbr is None:
+        with medir("estado"):
+            try:
+                with cargas.abrir_pdf(pdf_file) as doc:
+                    state_abbr = estados.estado_de_documento(doc) or ""
+            except Exception as e:
+                print(f"No se pudo leer el texto del acta: {e}")
+                state_abbr = ""
+        state_cache.guardar(digest, state_abbr, 64)
+    return state_abbr or estados.estado_de_posicion(filename)
+
+def frame_templates(state_abbr, apply_front, apply_rear):
+    """Plantillas de marco a usar: (marco delantero o None, marco del estado o None)."""
+    background = obtener_plantilla(BACKGROUND_PDF_PATH) if apply_front else None
+    state_frame = state_frame_template(state_abbr) if apply_rear and state_abbr else None
+    return background, state_frame
+
+def template_versions(background, state_frame):
+    """Versiones de las plantillas de marco en uso (None donde no hay marco)."""
+    return (
+        background.version if background is not None else None,
+        state_frame.version if state_frame is not None else None,
     )
-    qr.add_data(text)
-    qr.make(fit=True)
-    img = qr.make_image(fill='black', back_color='white')
 
-    # Convertir la imagen de QR a formato PNG utilizando Pillow
-    img_byte_array = BytesIO()
-    img.save(img_byte_array, format="PNG")  # Guardar en BytesIO como PNG
-    img_byte_array.seek(0)  # Mover el puntero al inicio
+def output_cache_key(digest, filename, background, state_frame, save_profile, pages_per_acta=0):
+    """Clave de la caché de salida: hash del acta, nombre (QR/estado), marcos, sus versiones, perfil y división en actas."""
+    return (digest, filename, template_versions(background, state_frame), codigos.QR_MODO, save_profile, pages_per_acta)
+
+def request_save_profile(form):
+    """Perfil de guardado pedido en el campo `perfil` (o el del despliegue); ValueError si no existe."""
+    profile = form.get('perfil') or DEFAULT_SAVE_PROFILE
+    if profile not in SAVE_PROFILES:
+        raise ValueError(f"Perfil de guardado no soportado. Usa uno de: {', '.join(SAVE_PROFILES)}.")
+    return profile
 
-    # Crear un Pixmap de PyMuPDF desde el stream de bytes PNG
-    qr_img_fitz = fitz.Pixmap(img_byte_array)  # Cargar imagen PNG directamente en Pixmap
-    
-    return qr_img_fitz
+def request_pages_per_acta(form):
+    """Páginas por acta pedidas en `paginas_por_acta` (0: todo el PDF es una acta); ValueError si no es válido."""
+    valor = form.get('paginas_por_acta') or '0'
+    if not valor.isdigit():
+        raise ValueError("El campo 'paginas_por_acta' debe ser un entero mayor o igual a 0.")
+    return int(valor)
 
-def generate_barcode(text):
+def request_preview_options(form):
+    """Página, resolución y formato pedidos para la vista previa; ValueError si no son válidos."""
+    page_num, dpi = form.get('pagina') or '0', form.get('dpi') or str(PREVIEW_DPI)
+    if not page_num.isdigit() or not dpi.isdigit():
+        raise ValueError("Los campos 'pagina' y 'dpi' deben ser enteros.")
+    dpi = int(dpi)
+    if not PREVIEW_DPI_RANGE[0] <= dpi <= PREVIEW_DPI_RANGE[1]:
+        raise ValueError(f"El campo 'dpi' debe estar entre {PREVIEW_DPI_RANGE[0]} y {PREVIEW_DPI_RANGE[1]}.")
+    image_format = form.get('formato') or 'png'
+    if image_format not in PREVIEW_FORMATS:
+        raise ValueError(f"Formato no soportado. Usa uno de: {', '.join(PREVIEW_FORMATS)}.")
+    return int(page_num), dpi, image_format
+
+class FramedSkeleton:
+    """Páginas de marco de una combinación (delantero, estado) ya armadas, con el lugar del QR reservado.
+
+    Las primeras `front_pages` páginas son el marco delantero (donde se estampa el
+    acta) y las siguientes el marco del estado. `qr_page` es la página con el
+    Form XObject vacío QR_SLOT que se dibuja en los dos rectángulos del QR, o None.
     """
-    Genera un código de barras vectorial sin texto y lo devuelve como un objeto Pixmap de PyMuPDF.
+
+    def __init__(self, doc, versions, front_pages, qr_page):
+        self.doc = doc
+        self.versions = versions
+        self.front_pages = front_pages
+        self.qr_page = qr_page
+        # PyMuPDF no es seguro entre hilos: el documento compartido se usa bajo este candado
+        self.lock = threading.Lock()
+
+QR_SLOT = "QRslot"
+_skeletons = {}
+_skeletons_lock = threading.Lock()
+
+def qr_rects(page_height):
+    """Rectángulos de los dos QR de la segunda página."""
+    # Primer QR (parte superior)
+    qr_rect = fitz.Rect(34, 24, 95, 88)
+    # Segundo QR (parte inferior izquierda)
+    qr_size_small = 17 * 2.83465  # Tamaño del segundo QR en puntos
+    move_up = 5.33 * 2.83465  # Ajuste para mover el QR hacia arriba
+    move_right = 4.26 * 2.83465  # Ajuste para mover el QR hacia la derecha
+    qr_rect_bottom_left = fitz.Rect(
+        20 + move_right,
+        (page_height - qr_size_small - 10) - move_up,
+        (20 + qr_size_small + move_right),
+        (page_height - 10) - move_up
+    )
+    return qr_rect, qr_rect_bottom_left
+
+def _reserve_qr_slot(doc, page_num):
+    """Agrega a la página un Form XObject vacío dibujado en los rectángulos del QR."""
+    page = doc.load_page(page_num)
+    slot_xref = doc.get_new_xref()
+    doc.update_object(slot_xref, "<< /Type /XObject /Subtype /Form /BBox [0 0 1 1] /Resources << >> >>")
+    doc.update_stream(slot_xref, b"\n")
+
+    # Registrar el XObject en los recursos de la página (el diccionario puede ser indirecto)
+    tipo, valor = doc.xref_get_key(page.xref, "Resources")
+    if tipo == "xref":
+        doc.xref_set_key(int(valor.split()[0]), f"XObject/{QR_SLOT}", f"{slot_xref} 0 R")
+    else:
+        doc.xref_set_key(page.xref, f"Resources/XObject/{QR_SLOT}", f"{slot_xref} 0 R")
+
+    # Dibujarlo en un flujo de contenido adicional, centrado y cuadrado en cada rectángulo
+    # (show_pdf_page e insert_image también conservan la proporción)
+    a_pdf = ~page.transformation_matrix
+    operadores = []
+    for rect in qr_rects(page.rect.height):
+        rect = rect * a_pdf
+        lado = min(rect.width, rect.height)
+        x0 = rect.x0 + (rect.width - lado) / 2
+        y0 = rect.y0 + (rect.height - lado) / 2
+        operadores.append(f"q {lado:g} 0 0 {lado:g} {x0:g} {y0:g} cm /{QR_SLOT} Do Q\n")
+    contenido_xref = doc.get_new_xref()
+    doc.update_object(contenido_xref, "<< >>")
+    doc.update_stream(contenido_xref, "".join(operadores).encode())
+    contenidos = " ".join(f"{xref} 0 R" for xref in page.get_contents())
+    doc.xref_set_key(page.xref, "Contents", f"[{contenidos} {contenido_xref} 0 R]")
+
+def _build_skeleton(background, state_frame):
+    doc = fitz.open()
+    if background is not None:
+        with background.lock:
+            doc.insert_pdf(background.esqueleto())
+    front_pages = len(doc)
+    if state_frame is not None:
+        with state_frame.lock:
+            doc.insert_pdf(state_frame.esqueleto())
+    # El QR va en la primera página del marco del estado
+    qr_page = front_pages if state_frame is not None else None
+    if qr_page is None or qr_page >= len(doc) or doc.load_page(qr_page).rotation:
+        qr_page = None
+    else:
+        _reserve_qr_slot(doc, qr_page)
+    return FramedSkeleton(doc, template_versions(background, state_frame), front_pages, qr_page)
+
+def framed_skeleton(background, state_frame):
+    """Esqueleto de la combinación de marcos (None si no hay marcos); se rehace si cambian las plantillas."""
+    if background is None and state_frame is None:
+        return None
+    key = (
+        background.ruta if background is not None else None,
+        state_frame.ruta if state_frame is not None else None,
+    )
+    versions = template_versions(background, state_frame)
+    skeleton = _skeletons.get(key)
+    if skeleton is not None and skeleton.versions == versions:
+        return skeleton
+    with _skeletons_lock:
+        skeleton = _skeletons.get(key)
+        if skeleton is None or skeleton.versions != versions:
+            skeleton = _skeletons[key] = _build_skeleton(background, state_frame)
+    return skeleton
+
+def preload_skeletons():
+    """Arma los esqueletos de todas las combinaciones de marco delantero y estado. Devuelve cuántos."""
+    background = obtener_plantilla(BACKGROUND_PDF_PATH)
+    state_frames = [state_frame_template(abbr) for abbr in ESTADOS]
+    armados = 0
+    for front in (background, None):
+        for state_frame in [None] + [frame for frame in state_frames if frame is not None]:
+            if framed_skeleton(front, state_frame) is not None:
+                armados += 1
+    return armados
+
+def acta_ranges(page_count, pages_per_acta=0):
+    """Rangos [inicio, fin) de las actas del PDF subido (pages_per_acta=0: todo el PDF es una sola acta)."""
+    step = pages_per_acta or page_count
+    return [(first, min(first + step, page_count)) for first in range(0, page_count, step)]
+
+def _clone_page(output_pdf, page_num):
+    """Agrega al final una copia de la página que comparte sus XObjects de marco (y el lugar del QR)."""
+    output_pdf.fullcopy_page(page_num)
+    copy = output_pdf.load_page(len(output_pdf) - 1)
+    # Diccionario de recursos propio: show_pdf_page le agrega el XObject del acta y, si
+    # fuera compartido, crecería con cada página
+    tipo, valor = output_pdf.xref_get_key(copy.xref, "Resources")
+    if tipo == "xref":
+        output_pdf.xref_set_key(copy.xref, "Resources", output_pdf.xref_object(int(valor.split()[0]), compressed=True))
+
+def compose_framed_pdf(selected_pdf, filename, background, state_frame, pages_per_acta=0):
+    """Arma el documento enmarcado (marcos y QR, sin folio) de cada acta del PDF subido.
+
+    Cada página del acta va sobre su propio marco delantero y al final del acta van
+    las páginas del estado. Devuelve el documento abierto y la página inicial de cada acta.
     """
-    try:
-        from barcode import Code128
-        from barcode.writer import SVGWriter
-        from io import StringIO
-        import re
-        from cairosvg import svg2png
-        
-        # Crear un objeto StringIO para el contenido SVG
-        svg_io = StringIO()
-        
-        # Configurar el escritor SVG con opciones que eliminen completamente el texto
-        svg_options = {
-            'write_text': False,      # Desactivar el texto
-            'text': '',               # Texto vacío
-            'module_height': 15,      # Altura de las barras en mm
-            'module_width': 0.25,     # Ancho de cada barra
-            'quiet_zone': 3,          # Margen de seguridad
-            'font_size': 0,           # Tamaño de fuente cero
-            'dpi': 300,               # Alta resolución
-            'text_distance': 0        # Sin distancia para texto
-        }
-        
-        # Generar código de barras Code128 en formato SVG
-        Code128(text, writer=SVGWriter(svg_options)).write(svg_io)
-        
-        # Obtener el contenido SVG
-        svg_content = svg_io.getvalue()
-        
-        # Eliminar cualquier elemento de texto en el SVG usando expresiones regulares
-        svg_content = re.sub(r'<text.*?</text>', '', svg_content, flags=re.DOTALL)
-        
-        # Ajustar las dimensiones del SVG para recortar la parte inferior donde aparecería el texto
-        width_match = re.search(r'width="(\d+(\.\d+)?)"', svg_content)
-        height_match = re.search(r'height="(\d+(\.\d+)?)"', svg_content)
-        
-        if width_match and height_match:
-            original_height = float(height_match.group(1))
-            # Usar solo el 60% superior del SVG para eliminar el área donde estaría el texto
-            new_height = original_height * 0.6
-            
-            svg_content = svg_content.replace(
-                f'width="{width_match.group(1)}"', 'width="130"'
-            ).replace(
-                f'height="{height_match.group(1)}"', f'height="{new_height}"'
+    output_pdf = fitz.open()
+    skeleton = framed_skeleton(background, state_frame)
+    front_pages = skeleton.front_pages if skeleton is not None else 0
+    skeleton_pages = len(skeleton.doc) if skeleton is not None else 0
+
+    # Primero se arma la estructura de todas las actas clonando las páginas del esqueleto
+    # (insertado una sola vez al principio); las copias comparten los XObjects de los
+    # marcos, así que cada acta adicional solo agrega sus propios flujos de contenido
+    acta_starts, stamps, qr_pages = [], [], []
+    with medir("esqueleto"):
+        if skeleton is not None:
+            with skeleton.lock:
+                output_pdf.insert_pdf(skeleton.doc)
+        for first, last in acta_ranges(len(selected_pdf), pages_per_acta):
+            start = len(output_pdf)
+            acta_starts.append(start - skeleton_pages)
+            for offset, page_num in enumerate(range(first, last)):
+                if background is not None:
+                    _clone_page(output_pdf, offset % front_pages)
+                else:
+                    rect = selected_pdf.load_page(page_num).rect
+                    output_pdf.new_page(width=rect.width, height=rect.height)
+                stamps.append((len(output_pdf) - 1, page_num))
+            state_start = len(output_pdf)
+            for page_num in range(front_pages, skeleton_pages):
+                _clone_page(output_pdf, page_num)
+            # El QR va en la primera página del estado o, si no hay marco trasero, en la segunda del acta
+            qr_page = state_start if state_start < len(output_pdf) else start + 1
+            if qr_page < len(output_pdf):
+                qr_pages.append((qr_page, state_start < len(output_pdf)))
+        if skeleton_pages:
+            # Las páginas originales del esqueleto solo sirvieron de molde
+            output_pdf.delete_pages(0, skeleton_pages - 1)
+
+    # Estampar cada página del acta sobre su marco delantero o en su página nueva
+    with medir("marco_delantero" if background is not None else "paginas_acta"):
+        for page_index, page_num in stamps:
+            new_page = output_pdf.load_page(page_index - skeleton_pages)
+            new_page.show_pdf_page(new_page.rect, selected_pdf, page_num)
+
+    # Insertar los QR: en el lugar reservado del esqueleto (compartido por todas las
+    # copias, se llena una vez) o dibujándolos en la página
+    if qr_pages:
+        with medir("qr"):
+            slot_filled = False
+            for page_index, on_state_page in qr_pages:
+                page = output_pdf.load_page(page_index - skeleton_pages)
+                if on_state_page and skeleton.qr_page is not None:
+                    slot_filled = slot_filled or _fill_qr_slot(page, filename)
+                    if slot_filled:
+                        continue
+                _stamp_qr_codes(page, filename)
+
+    return output_pdf, acta_starts
+
+def _fill_qr_slot(page, filename):
+    """Escribe el QR vectorial de `filename` en el XObject reservado de la página."""
+    if codigos.QR_MODO == "imagen":
+        return False
+    for xref, name, *_ in page.get_xobjects():
+        if name == QR_SLOT:
+            lado, operadores = codigos.qr_operadores(filename)
+            doc = page.parent
+            doc.update_object(
+                xref,
+                f"<< /Type /XObject /Subtype /Form /BBox [0 0 {lado} {lado}] /Matrix [{1 / lado:g} 0 0 {1 / lado:g} 0 0] /Resources << >> >>",
             )
-            
-            # Ajustar el viewBox para recortar la parte inferior
-            viewbox_match = re.search(r'viewBox="([^"]*)"', svg_content)
-            if viewbox_match:
-                viewbox_parts = viewbox_match.group(1).split(' ')
-                if len(viewbox_parts) == 4:
-                    viewbox_parts[3] = str(float(viewbox_parts[3]) * 0.6)  # Reducir altura del viewBox
-                    new_viewbox = ' '.join(viewbox_parts)
-                    svg_content = svg_content.replace(viewbox_match.group(0), f'viewBox="{new_viewbox}"')
-        
-        # Convertir el SVG modificado a PNG con alta resolución
-        png_data = BytesIO()
-        svg2png(
-            bytestring=svg_content.encode('utf-8'),
-            write_to=png_data,
-            output_width=390,
-            output_height=40,  # Reducir altura para evitar espacio en blanco
-            scale=3.0
-        )
-        png_data.seek(0)
-        
-        # Crear un Pixmap de PyMuPDF
-        barcode_img = fitz.Pixmap(png_data)
-        return barcode_img
-        
-    except Exception as e:
-        print(f"Error generando código de barras SVG: {e}")
-        # Método alternativo usando PIL/Pillow
+            doc.update_stream(xref, f"0 g\n{operadores}f\n".encode())
+            return True
+    return False
+
+def _stamp_qr_codes(page, filename):
+    """Estampa los dos QR con el nombre del acta en la página."""
+    for rect in qr_rects(page.rect.height):
+        draw_qr(page, rect, filename)
+
+def stamp_folio(output_pdf, folio, page_num=0):
+    """Inserta el folio y su código de barras real en la primera página del acta."""
+    folio_text, barcode_text = folios.texto_folio(folio)  # Sin espacio para el código de barras
+
+    first_page = output_pdf.load_page(page_num)
+    # Ambos textos en una sola Shape: una sola inserción de la fuente y un solo commit
+    shape = first_page.new_shape()
+    shape.insert_text((85, 48), "FOLIO", fontsize=14, fontname="times-bold", color=(0, 0, 0))
+    shape.insert_text((75, 65), folio_text, fontsize=12, fontname="times-bold", color=(0, 0, 0))
+    shape.commit()
+
+    # Dibujar el código de barras (sin texto) como barras vectoriales
+    rect = fitz.Rect(45, 72, 175, 87)
+    draw_barcode(first_page, rect, barcode_text)
+
+def stamp_folios(output_pdf, acta_starts, filename, user_id=None):
+    """Emite un folio por acta (queda en el registro de emisiones) y lo estampa en su primera página."""
+    with medir("folio"):
+        for start in acta_starts:
+            stamp_folio(output_pdf, folios.emitir_folio(filename, user_id), start)
+    with medir("registro_folio"):
+        folios.asentar_emisiones()
+
+def write_with_folios(framed, acta_starts, filename, output_stream, save_options, user_id=None):
+    """Escribe el PDF enmarcado sin folio (`framed`) con folios nuevos estampados.
+
+    Los folios van en una actualización incremental: los bytes ya guardados se
+    copian tal cual y solo se agregan los objetos que cambia el estampado, sin un
+    segundo guardado completo. PyMuPDF solo guarda en incremental sobre el archivo
+    del que abrió el documento, por eso se trabaja en un temporal.
+    """
+    with tempfile.NamedTemporaryFile("wb+", dir=cargas.CARGAS_DIR, prefix="folio_", suffix=".pdf") as temporal:
+        temporal.write(framed)
+        temporal.flush()
+        output_pdf = fitz.open(temporal.name, filetype="pdf")
         try:
-            from PIL import Image, ImageDraw
-            from barcode import Code128
-            from barcode.writer import ImageWriter
-            
-            # Configurar opciones personalizadas para el ImageWriter
-            class CustomImageWriter(ImageWriter):
-                def _paint_text(self, *args, **kwargs):
-                    # Sobrescribir el método de pintar texto para que no haga nada
-                    pass
-            
-            # Crear un escritor personalizado
-            writer = CustomImageWriter()
-            writer.set_options({
-                'write_text': False,
-                'text': '',
-                'font_size': 0,
-                'text_distance': 0,
-                'module_height': 15.0,
-                'module_width': 0.2,
-                'quiet_zone': 3.0,
-                'background': (255, 255, 255),
-                'foreground': (0, 0, 0),
-                'dpi': 300
-            })
-            
-            # Generar código de barras
-            output = BytesIO()
-            Code128(text, writer=writer).write(output)
-            output.seek(0)
-            
-            # Abrir la imagen
-            img = Image.open(output)
-            
-            # Recortar la parte inferior para eliminar cualquier espacio donde podría estar el texto
-            width, height = img.size
-            # Conservar solo el 60% superior de la imagen
-            new_height = int(height * 0.6)
-            img = img.crop((0, 0, width, new_height))
-            
-            # Redimensionar con algoritmo de alta calidad
-            img = img.resize((390, 40), Image.LANCZOS)
-            
-            # Guardar con formato PNG sin compresión
-            img_bytes = BytesIO()
-            img.save(img_bytes, format="PNG", optimize=False, compression=0)
-            img_bytes.seek(0)
-            
-            return fitz.Pixmap(img_bytes)
-            
-        except Exception as backup_error:
-            print(f"Error en método de respaldo: {backup_error}")
-            return None
-def overlay_pdf_on_background(pdf_file, output_stream, apply_front, apply_rear, apply_folio):
-    """Superpone PDFs según las opciones seleccionadas."""
+            stamp_folios(output_pdf, acta_starts, filename, user_id)
+            with medir("guardado_folio"):
+                output_pdf.save(
+                    temporal.name, incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP,
+                    deflate=save_options.get("deflate", False),
+                )
+        finally:
+            output_pdf.close()
+        temporal.seek(0)
+        shutil.copyfileobj(temporal, output_stream)
+
+def overlay_pdf_on_background(pdf_file, output_stream, apply_front, apply_rear, apply_folio, save_profile=None, pages_per_acta=0, user_id=None):
+    """Superpone PDFs según las opciones seleccionadas (con pages_per_acta > 0 el PDF trae varias actas).
+
+    `user_id` queda en el registro de los folios emitidos.
+    """
+    save_profile = save_profile or DEFAULT_SAVE_PROFILE
+    save_options = SAVE_PROFILES[save_profile]
     try:
-        # Leer el PDF subido en memoria
+        # Solo se calcula el hash: el contenido no se copia a memoria
+        with medir("lectura"):
+            digest = cargas.huella(pdf_file)
+        filename = os.path.basename(pdf_file.filename)
+        state_abbr = detect_state(digest, filename, pdf_file) if apply_rear else None
+        background, state_frame = frame_templates(state_abbr, apply_front, apply_rear)
+        if apply_front and background is None:
+            return False, "Error: No se encontró el marco delantero."
+
+        # La caché guarda el documento sin folio: cada solicitud emite y estampa folios nuevos
+        with medir("cache_salida"):
+            cache_key = output_cache_key(digest, filename, background, state_frame, save_profile, pages_per_acta)
+            cached = output_cache.obtener(cache_key)
+        if cached is not None:
+            framed, acta_starts = cached
+            if apply_folio:
+                write_with_folios(framed, acta_starts, filename, output_stream, save_options, user_id)
+            else:
+                output_stream.write(framed)
+            return True, "PDF generado correctamente."
+
+        # Abrir el PDF subido desde su temporal o su buffer, sin copiarlo
         try:
-            selected_pdf = fitz.open(stream=pdf_file.read(), filetype="pdf")
+            with medir("apertura"):
+                selected_pdf = cargas.abrir_pdf(pdf_file)
         except Exception as e:
             return False, f"Error al cargar el archivo PDF: {e}"
 
         if len(selected_pdf) == 0:
             return False, "Error: El PDF cargado está vacío."
 
-        output_pdf = fitz.open()
-
-        # Si se selecciona el enmarcado delantero, se usa el PDF de fondo (marcoparaactas.pdf)
-        if apply_front:
-            background_pdf = fitz.open(BACKGROUND_PDF_PATH)
-            for page_num in range(len(background_pdf)):
-                background_page = background_pdf.load_page(page_num)
-                new_page = output_pdf.new_page(width=background_page.rect.width, height=background_page.rect.height)
-                new_page.show_pdf_page(new_page.rect, background_pdf, page_num)
-                if page_num < len(selected_pdf):
-                    selected_page = selected_pdf.load_page(page_num)
-                    new_page.show_pdf_page(new_page.rect, selected_pdf, page_num)
-            background_pdf.close()
-        else:
-            # Si NO se selecciona el delantero, se agregan las páginas del PDF subido directamente
-            for page_num in range(len(selected_pdf)):
-                selected_page = selected_pdf.load_page(page_num)
-                new_page = output_pdf.new_page(width=selected_page.rect.width, height=selected_page.rect.height)
-                new_page.show_pdf_page(new_page.rect, selected_pdf, page_num)
-
-        # Si se selecciona el enmarcado trasero, se agregan los marcos (segunda parte)
-        if apply_rear:
-            filename = os.path.basename(pdf_file.filename)
-            state_abbr = filename[11:13].upper()
-            if state_abbr in ESTADOS:
-                state_pdf_path = os.path.join(MARCOS_FOLDER, f"{state_abbr}.pdf")
-                if os.path.exists(state_pdf_path):
-                    state_pdf = fitz.open(state_pdf_path)
-                    for state_page_num in range(len(state_pdf)):
-                        new_page = output_pdf.new_page(width=state_pdf[state_page_num].rect.width, height=state_pdf[state_page_num].rect.height)
-                        new_page.show_pdf_page(new_page.rect, state_pdf, state_page_num)
-                    state_pdf.close()
-
-        # Insertar códigos QR en la segunda página (parte inferior izquierda) se mantiene sin cambios
-        if len(output_pdf) > 1:
-            filename = os.path.basename(pdf_file.filename)
-            qr_img = generate_qr_code(filename)
-            second_page = output_pdf.load_page(1)
-            # Primer QR (parte superior)
-            qr_rect = fitz.Rect(34, 24, 95, 88)
-            second_page.insert_image(qr_rect, pixmap=qr_img)
-            # Segundo QR (parte inferior izquierda)
-            page_height = second_page.rect.height
-            qr_size_small = 17 * 2.83465  # Tamaño del segundo QR en puntos
-            move_up = 5.33 * 2.83465  # Ajuste para mover el QR hacia arriba
-            move_right = 4.26 * 2.83465  # Ajuste para mover el QR hacia la derecha
-            qr_rect_bottom_left = fitz.Rect(
-                20 + move_right,
-                (page_height - qr_size_small - 10) - move_up,
-                (20 + qr_size_small + move_right),
-                (page_height - 10) - move_up
-            )
-            second_page.insert_image(qr_rect_bottom_left, pixmap=qr_img)
+        output_pdf, acta_starts = compose_framed_pdf(selected_pdf, filename, background, state_frame, pages_per_acta)
 
-        # Insertar folio (si se selecciona) en la primera página con código de barras real
-        if apply_folio:
-            folio_random = random.randint(100000, 999999)
-            barcode_text = "A30" + str(folio_random)  # Sin espacio para el código de barras
-
-            first_page = output_pdf.load_page(0)
-            first_page.insert_text((85, 48), "FOLIO", fontsize=14, fontname="times-bold", color=(0, 0, 0))
-            first_page.insert_text((75, 65), "A30-" + str(folio_random), fontsize=12, fontname="times-bold", color=(0, 0, 0))
-
-            # Generar código de barras sin texto
-            barcode_img = generate_barcode(barcode_text)
-            
-            if barcode_img:
-                # Insertar imagen del código de barras con alta calidad
-                # Ajustar el tamaño y posición para mejor visualización
-                rect = fitz.Rect(45, 72, 175, 87)
-                
-                # Usar método mejorado para inserción
-                first_page.insert_image(
-                    rect, 
-                    pixmap=barcode_img,
-                    keep_proportion=True,  # Mantener proporción
-                    overlay=True  # Superponer sin modificar el fondo
-                )
-
-        output_pdf.save(output_stream)
+        # Un solo guardado completo, sin folio, para la caché; los folios se agregan encima
+        with medir("guardado"):
+            framed = output_pdf.tobytes(**save_options)
         output_pdf.close()
         selected_pdf.close()
+        output_cache.guardar(cache_key, (framed, acta_starts), len(framed))
+        if apply_folio:
+            write_with_folios(framed, acta_starts, filename, output_stream, save_options, user_id)
+        else:
+            output_stream.write(framed)
         return True, "PDF generado correctamente."
 
     except Exception as e:
         print(f"Error overlaying PDFs: {e}")
         return False, f"Error al generar el PDF: {e}"
 
+def render_preview(pdf_file, apply_front, apply_rear, apply_folio, pages_per_acta=0, page_num=0, dpi=PREVIEW_DPI, image_format="png"):
+    """Imagen de una página del documento enmarcado: (bytes, hash de la carga, páginas del documento).
+
+    Compone igual que overlay_pdf_on_background pero sin guardar el PDF; el folio es
+    uno de muestra que no se emite. ValueError si la carga o la página no sirven.
+    """
+    digest = cargas.huella(pdf_file)
+    filename = os.path.basename(pdf_file.filename)
+    state_abbr = detect_state(digest, filename, pdf_file) if apply_rear else None
+    background, state_frame = frame_templates(state_abbr, apply_front, apply_rear)
+    if apply_front and background is None:
+        raise ValueError("No se encontró el marco delantero.")
+
+    cache_key = (
+        digest, filename, template_versions(background, state_frame), codigos.QR_MODO,
+        apply_folio, pages_per_acta, page_num, dpi, image_format,
+    )
+    cached = preview_cache.obtener(cache_key)
+    if cached is not None:
+        return cached[0], digest, cached[1]
+
+    with cargas.abrir_pdf(pdf_file) as selected_pdf:
+        if len(selected_pdf) == 0:
+            raise ValueError("El PDF cargado está vacío.")
+        output_pdf, acta_starts = compose_framed_pdf(selected_pdf, filename, background, state_frame, pages_per_acta)
+        with output_pdf:
+            page_count = len(output_pdf)
+            if page_num >= page_count:
+                raise ValueError(f"El documento enmarcado tiene {page_count} páginas.")
+            with medir("vista_previa"):
+                if apply_folio and page_num in acta_starts:
+                    stamp_folio(output_pdf, 0, page_num)  # Folio de muestra: no se emite ni se registra
+                pixmap = output_pdf.load_page(page_num).get_pixmap(dpi=dpi)
+                # WebP con method=0: ~5 ms y 7 veces menos bytes que el PNG (~10 ms)
+                image = pixmap.pil_tobytes("WEBP", quality=80, method=0) if image_format == "webp" else pixmap.tobytes("png")
+    preview_cache.guardar(cache_key, (image, page_count), len(image))
+    return image, digest, page_count
+
 # Rutas del Blueprint
 @enmarcado_bp.route('/process_pdf', methods=['POST'])
+@admision.controlar()
 def process_pdf():
     """Procesa el PDF según las opciones seleccionadas."""
-    if not is_within_working_hours():
-        return "El servicio no está disponible fuera del horario de 9 AM a 5 PM.", 403
-    
+    # Rechazar cuerpos demasiado grandes antes de leerlos
+    if cargas.solicitud_excedida(request):
+        return 'El archivo excede el tamaño permitido.', 413
+
     try:
         if 'pdf_file' not in request.files:
             print("No file in request.files")
@@ -323,14 +541,26 @@ def process_pdf():
         if pdf_file.filename == '':
             print("No file selected")
             return 'No selected file', 400
+
+        rechazo = cargas.rechazo_carga(pdf_file)
+        if rechazo is not None:
+            return rechazo
         
         # Leer las opciones de enmarcado del formulario
         apply_front = True if request.form.get('front_frame') == 'on' else False
         apply_rear  = True if request.form.get('rear_frame')  == 'on' else False
         apply_folio = True if request.form.get('folio')       == 'on' else False
+        try:
+            save_profile = request_save_profile(request.form)
+            pages_per_acta = request_pages_per_acta(request.form)
+        except ValueError as e:
+            return str(e), 400
 
         output_stream = BytesIO()
-        success, message = overlay_pdf_on_background(pdf_file, output_stream, apply_front, apply_rear, apply_folio)
+        with trazar(pdf_file.filename), medir("total"):
+            success, message = overlay_pdf_on_background(
+                pdf_file, output_stream, apply_front, apply_rear, apply_folio, save_profile, pages_per_acta, session.get('user_id')
+            )
         if not success:
             print(f"Error generando el PDF: {message}")
             return message, 500
@@ -338,13 +568,163 @@ def process_pdf():
         output_stream.seek(0)
         return send_file(output_stream, as_attachment=True, download_name=f"_{pdf_file.filename}", mimetype='application/pdf')
 
+    except HTTPException:
+        raise  # 413 de un cuerpo sin Content-Length que excede el límite al leerlo, etc.
     except Exception as e:
         print(f"Error procesando PDF: {e}")
         return 'Error procesando archivo PDF', 500
 
-# Registrar el Blueprint con la aplicación
-app.register_blueprint(enmarcado_bp)
+@enmarcado_bp.route('/process_pdf/batch', methods=['POST'])
+@admision.controlar()
+def process_pdf_batch():
+    """Procesa un lote de PDFs en paralelo y devuelve un ZIP o un solo PDF unido."""
+    # Rechazar cuerpos demasiado grandes antes de leerlos
+    if cargas.solicitud_excedida(request, cargas.SOLICITUD_MAX_BYTES):
+        return 'El lote excede el tamaño permitido.', 413
+
+    try:
+        try:
+            compartidas, por_archivo = lotes.leer_opciones(request.form)
+            save_profile = request_save_profile(request.form)
+            pages_per_acta = request_pages_per_acta(request.form)
+            archivos = lotes.leer_archivos(request.files)
+        except ValueError as e:
+            return str(e), 400
+
+        if not archivos:
+            return 'No file uploaded', 400
+        print(f"Lote recibido: {len(archivos)} archivos")
+
+        formato = request.form.get('formato', 'zip')
+        if formato not in ('zip', 'pdf'):
+            return "Formato no soportado. Usa 'zip' o 'pdf'.", 400
+        admision.cobrar(len(archivos) - 1)  # Una ficha por acta; la primera se cobró al admitir
+
+        resultados = lotes.iterar_lote(archivos, compartidas, por_archivo, save_profile, pages_per_acta, session.get('user_id'))
+
+        if formato == 'pdf':
+            output_stream, errores = lotes.armar_pdf_unico(resultados, save_profile)
+            if len(errores) == len(archivos):
+                return "\n".join(errores), 500
+            response = send_file(output_stream, as_attachment=True, download_name="actas_enmarcadas.pdf", mimetype='application/pdf')
+            response.headers['X-Enmarcado-Errores'] = str(len(errores))
+            return response
+
+        # El ZIP se transmite conforme se generan los PDFs, sin armarlo completo en memoria
+        return Response(
+            stream_with_context(lotes.generar_zip(resultados)),
+            mimetype='application/zip',
+            headers={'Content-Disposition': 'attachment; filename=actas_enmarcadas.zip'},
+        )
+
+    except HTTPException:
+        raise  # 413 de un cuerpo sin Content-Length que excede el límite al leerlo, etc.
+    except Exception as e:
+        print(f"Error procesando lote: {e}")
+        return 'Error procesando lote de PDFs', 500
+
+@enmarcado_bp.route('/process_pdf/jobs', methods=['POST'])
+@admision.controlar(en_vuelo=False, respuesta_json=True)  # Su concurrencia la limita la cola de trabajos
+def process_pdf_job():
+    """Encola el PDF para procesarlo en segundo plano y devuelve el id del trabajo."""
+    if cargas.solicitud_excedida(request):
+        return 'El archivo excede el tamaño permitido.', 413
+
+    pdf_file = request.files.get('pdf_file')
+    if pdf_file is None or pdf_file.filename == '':
+        return 'No file uploaded', 400
+    rechazo = cargas.rechazo_carga(pdf_file)
+    if rechazo is not None:
+        return rechazo
+
+    apply_front = request.form.get('front_frame') == 'on'
+    apply_rear  = request.form.get('rear_frame')  == 'on'
+    apply_folio = request.form.get('folio')       == 'on'
+    try:
+        save_profile = request_save_profile(request.form)
+        pages_per_acta = request_pages_per_acta(request.form)
+    except ValueError as e:
+        return str(e), 400
+
+    try:
+        trabajo = trabajos.encolar(session.get('user_id'), os.path.basename(pdf_file.filename), pdf_file, apply_front, apply_rear, apply_folio, save_profile, pages_per_acta)
+    except trabajos.ColaLlena as e:
+        return jsonify({"error": str(e)}), 429, {'Retry-After': '10'}
+
+    estado = trabajo.a_dict()
+    estado["url_estado"] = url_for('enmarcado.job_status', job_id=trabajo.id)
+    estado["url_descarga"] = url_for('enmarcado.job_download', job_id=trabajo.id)
+    return jsonify(estado), 202
+
+def _trabajo_propio(job_id):
+    """Estado del trabajo si pertenece al usuario de la sesión."""
+    estado = trabajos.consultar(job_id)
+    if estado is None or estado["user_id"] != session.get('user_id'):
+        return None
+    return estado
+
+@enmarcado_bp.route('/process_pdf/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Consulta el estado de un trabajo."""
+    estado = _trabajo_propio(job_id)
+    if estado is None:
+        return jsonify({"error": "Trabajo no encontrado."}), 404
+    return jsonify(estado)
+
+@enmarcado_bp.route('/process_pdf/jobs/<job_id>/download', methods=['GET'])
+def job_download(job_id):
+    """Descarga el PDF de un trabajo terminado."""
+    estado = _trabajo_propio(job_id)
+    if estado is None:
+        return 'Trabajo no encontrado.', 404
+    if estado["estado"] != trabajos.TERMINADO:
+        return jsonify(estado), 409
+    return send_file(trabajos.ruta_resultado(job_id), as_attachment=True, download_name=f"_{estado['nombre']}", mimetype='application/pdf')
+
+@enmarcado_bp.route('/process_pdf/preview', methods=['POST'])
+@admision.controlar(costo=PREVIEW_COST)
+def preview_pdf():
+    """Vista previa de una página del acta enmarcada, como PNG o WebP de baja resolución.
+
+    La primera solicitud sube el PDF; las siguientes pueden mandar solo `huella` y
+    `nombre` (devueltos en X-Enmarcado-Huella); 404 si la carga ya no está guardada.
+    """
+    if cargas.solicitud_excedida(request):
+        return 'El archivo excede el tamaño permitido.', 413
+
+    pdf_file = request.files.get('pdf_file')
+    if pdf_file is not None and pdf_file.filename:
+        rechazo = cargas.rechazo_carga(pdf_file)
+        if rechazo is not None:
+            return rechazo
+    else:
+        datos = preview_uploads.obtener(request.form.get('huella', ''))
+        if datos is None:
+            return 'La carga ya no está disponible, envía el archivo de nuevo.', 404
+        pdf_file = FileStorage(BytesIO(datos), filename=request.form.get('nombre') or 'acta.pdf')
+
+    apply_front = request.form.get('front_frame') == 'on'
+    apply_rear  = request.form.get('rear_frame')  == 'on'
+    apply_folio = request.form.get('folio')       == 'on'
+    try:
+        pages_per_acta = request_pages_per_acta(request.form)
+        page_num, dpi, image_format = request_preview_options(request.form)
+        with trazar(pdf_file.filename), medir("total_vista_previa"):
+            image, digest, page_count = render_preview(
+                pdf_file, apply_front, apply_rear, apply_folio, pages_per_acta, page_num, dpi, image_format
+            )
+    except ValueError as e:
+        return str(e), 400
+    except Exception as e:
+        print(f"Error generando la vista previa: {e}")
+        return 'Error generando la vista previa', 500
 
-# Configuración del servidor para producción o local
-if __name__ == '__main__':
-    app.run(debug=os.getenv("FLASK_DEBUG", False), host='0.0.0.0', port=os.getenv("PORT", 5001))
+    if 'pdf_file' in request.files and preview_uploads.obtener(digest) is None:
+        pdf_file.stream.seek(0)
+        datos = pdf_file.stream.read()
+        preview_uploads.guardar(digest, datos, len(datos))
+    return Response(image, mimetype=PREVIEW_FORMATS[image_format], headers={
+        'X-Enmarcado-Huella': digest,
+        'X-Enmarcado-Paginas': str(page_count),
+        'Cache-Control': 'private, max-age=300',
+    })
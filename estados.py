@@ -0,0 +1,71 @@
+import re
+import unicodedata
+
+# Reconocimiento del estado de un acta para elegir su marco trasero.
+# Primero se busca una CURP válida en el nombre del archivo; si no la hay (archivo
+# renombrado) se revisa la capa de texto de la primera página: la CURP impresa o la
+# línea de la entidad. Como último recurso se conserva la regla anterior de tomar
+# las posiciones 12 y 13 del nombre.
+
+# Diccionario de abreviaturas y estados
+ESTADOS = {
+    "AS": "AGUASCALIENTES", "BC": "BAJA CALIFORNIA", "BS": "BAJA CALIFORNIA SUR", "CC": "CAMPECHE",
+    "CL": "COAHUILA", "CM": "COLIMA", "CS": "CHIAPAS", "CH": "CHIHUAHUA", "DF": "DISTRITO FEDERAL",
+    "DG": "DURANGO", "GT": "GUANAJUATO", "GR": "GUERRERO", "HG": "HIDALGO", "JC": "JALISCO",
+    "MC": "MÉXICO", "MN": "MICHOACÁN", "MS": "MORELOS", "NT": "NAYARIT", "NL": "NUEVO LEÓN",
+    "OC": "OAXACA", "PL": "PUEBLA", "QT": "QUERÉTARO", "QR": "QUINTANA ROO", "SP": "SAN LUIS POTOSÍ",
+    "SL": "SINALOA", "SR": "SONORA", "TC": "TABASCO", "TS": "TAMAULIPAS", "TL": "TLAXCALA",
+    "VZ": "VERACRUZ", "YN": "YUCATÁN", "ZS": "ZACATECAS", "NE": "NACIDO EN EL EXTRANJERO"
+}
+
+PAGINAS_TEXTO = 1  # Páginas del acta que se revisan en la capa de texto
+
+
+def _sin_acentos(texto):
+    if texto.isascii():
+        return texto
+    return "".join(c for c in unicodedata.normalize("NFKD", texto) if not unicodedata.combining(c))
+
+
+# CURP: 4 letras, fecha AAMMDD, sexo, estado, 3 consonantes, homoclave y dígito verificador
+CURP_RE = re.compile(
+    r"(?<![A-Z0-9])[A-Z][AEIOUX][A-Z]{2}\d{2}(?:0[1-9]|1[0-2])(?:0[1-9]|[12]\d|3[01])[HMX]"
+    r"(" + "|".join(ESTADOS) + r")[B-DF-HJ-NP-TV-Z]{3}[0-9A-Z]\d(?![A-Z0-9])"
+)
+# Línea "ENTIDAD ...: NOMBRE" (los nombres más largos primero: BAJA CALIFORNIA SUR antes que BAJA CALIFORNIA)
+_NOMBRES = {_sin_acentos(nombre): abbr for abbr, nombre in ESTADOS.items()}
+ENTIDAD_RE = re.compile(
+    r"ENTIDAD[A-Z ]*:?\s*(" + "|".join(sorted(map(re.escape, _NOMBRES), key=len, reverse=True)) + r")\b"
+)
+
+
+def estado_de_curp(texto):
+    """Abreviatura del estado de la primera CURP válida en `texto`, o None."""
+    encontrada = CURP_RE.search(texto.upper())
+    return encontrada.group(1) if encontrada else None
+
+
+def estado_de_texto(texto):
+    """Abreviatura del estado según la capa de texto del acta (CURP o línea de la entidad), o None."""
+    texto = _sin_acentos(texto.upper())
+    abbr = estado_de_curp(texto)
+    if abbr is None:
+        encontrada = ENTIDAD_RE.search(texto)
+        abbr = _NOMBRES[encontrada.group(1)] if encontrada else None
+    return abbr
+
+
+def estado_de_documento(doc):
+    """Abreviatura del estado leída de las primeras páginas del PDF abierto, o None."""
+    for page_num in range(min(PAGINAS_TEXTO, len(doc))):
+        # flags=0: sin ligaduras ni espacios preservados, la extracción más rápida
+        abbr = estado_de_texto(doc.load_page(page_num).get_text("text", flags=0))
+        if abbr is not None:
+            return abbr
+    return None
+
+
+def estado_de_posicion(filename):
+    """Regla anterior: posiciones 12 y 13 del nombre (donde va el estado en una CURP), o None."""
+    abbr = filename[11:13].upper()
+    return abbr if abbr in ESTADOS else None
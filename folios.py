@@ -0,0 +1,243 @@
+import os
+import threading
+import multiprocessing.util
+from collections import deque
+from datetime import datetime
+
+from basedatos import obtener_pool
+
+# Asignación de folios únicos para las actas.
+# Cada proceso reserva en la base un bloque de FOLIO_BLOQUE números consecutivos
+# (UPDATE de la fila de la serie en folio_secuencia: la base serializa las
+# reservas de todos los procesos, así que dos bloques nunca se enciman) y entrega
+# los folios desde memoria. Cuando al bloque le queda menos de la mitad,
+# un hilo reserva el siguiente por adelantado: emitir un folio no espera a la base.
+# Los números de un bloque que no se usan (el proceso termina) quedan como huecos:
+# los folios son únicos, no consecutivos.
+# Cada emisión se anota en folios_emitidos (solo inserciones) con el nombre del
+# acta y el usuario. Con FOLIO_REGISTRO_SINCRONO (por omisión) la solicitud que
+# estampa folios los escribe antes de entregar el PDF (asentar_emisiones): si la
+# base no responde la solicitud falla y ningún folio sale sin registro. Las
+# escrituras de solicitudes simultáneas se juntan en una sola tanda.
+# Sin él, el mismo hilo de las reservas los escribe por tandas cada
+# FOLIO_REGISTRO_INTERVALO segundos y al terminar el proceso: un SIGKILL (o un
+# SIGTERM sin salida ordenada) pierde a lo más ese intervalo de registros.
+# Las emisiones sin escribir no crecen sin límite: con FOLIO_REGISTRO_MAX_PENDIENTES
+# por escribir (la base lleva rato caída) emitir falla con RegistroSaturado.
+
+FOLIO_SERIE = os.getenv("FOLIO_SERIE", "A30")
+# Primer folio de una serie nueva: los aleatorios anteriores eran de 6 dígitos
+FOLIO_INICIAL = int(os.getenv("FOLIO_INICIAL", "1000000"))
+FOLIO_BLOQUE = int(os.getenv("FOLIO_BLOQUE", "1000"))  # Folios por reserva
+FOLIO_REGISTRO_INTERVALO = float(os.getenv("FOLIO_REGISTRO_INTERVALO", "1"))  # Segundos entre escrituras del registro
+FOLIO_REGISTRO_SINCRONO = os.getenv("FOLIO_REGISTRO_SINCRONO", "1") == "1"
+FOLIO_REGISTRO_MAX_PENDIENTES = int(os.getenv("FOLIO_REGISTRO_MAX_PENDIENTES", "10000"))
+FOLIO_REGISTRO_TANDA = 1000  # Filas por executemany
+NOMBRE_ACTA_MAX = 255  # Largo de folios_emitidos.nombre_acta
+
+
+class RegistroSaturado(Exception):
+    """Hay demasiadas emisiones sin escribir en folios_emitidos para emitir otra."""
+
+
+def texto_folio(folio, serie=FOLIO_SERIE):
+    """Texto impreso del folio y el del código de barras (sin guion)."""
+    return f"{serie}-{folio:06d}", f"{serie}{folio:06d}"
+
+
+def reservar_bloque(serie, cantidad):
+    """Reserva `cantidad` folios consecutivos de la serie en la base. Devuelve el primero."""
+    for intento in range(2):
+        conn = obtener_pool().obtener()
+        try:
+            cursor = conn.cursor()
+            # El UPDATE bloquea la fila hasta el commit; el SELECT de la misma transacción ve el valor propio
+            cursor.execute("UPDATE folio_secuencia SET siguiente = siguiente + %s WHERE serie = %s", (cantidad, serie))
+            if cursor.rowcount == 0:
+                cursor.execute("INSERT INTO folio_secuencia (serie, siguiente) VALUES (%s, %s)", (serie, FOLIO_INICIAL + cantidad))
+            cursor.execute("SELECT siguiente FROM folio_secuencia WHERE serie = %s", (serie,))
+            fin = cursor.fetchone()[0]
+            conn.commit()
+            cursor.close()
+            return fin - cantidad
+        except Exception:
+            conn.rollback()
+            # Otro proceso creó la serie al mismo tiempo: el segundo intento la encuentra
+            if intento:
+                raise
+        finally:
+            conn.close()
+
+
+def registrar_emisiones(serie, filas):
+    """Inserta en folios_emitidos las emisiones (folio, nombre del acta, user_id, fecha)."""
+    conn = obtener_pool().obtener()
+    try:
+        cursor = conn.cursor()
+        for inicio in range(0, len(filas), FOLIO_REGISTRO_TANDA):
+            cursor.executemany(
+                "INSERT INTO folios_emitidos (serie, folio, nombre_acta, user_id, emitido) VALUES (%s, %s, %s, %s, %s)",
+                [(serie, *fila) for fila in filas[inicio:inicio + FOLIO_REGISTRO_TANDA]],
+            )
+        conn.commit()
+        cursor.close()
+    finally:
+        conn.close()
+
+
+class AsignadorFolios:
+    """Entrega folios desde bloques reservados y acumula sus emisiones para el registro."""
+
+    def __init__(self, serie=FOLIO_SERIE, bloque=FOLIO_BLOQUE, intervalo=FOLIO_REGISTRO_INTERVALO):
+        self.serie = serie
+        self.bloque = bloque
+        self.intervalo = intervalo
+        self._rangos = deque()  # Rangos reservados sin usar: [siguiente, fin)
+        self._pendientes = []  # Emisiones aún no escritas en folios_emitidos
+        self._lock = threading.Lock()
+        self._reserva_lock = threading.Lock()
+        self._registro_lock = threading.Lock()
+        self._despertar = threading.Event()
+        self._hilo = None
+        self._metricas = {
+            "emitidos": 0, "bloques": 0, "reservas_en_espera": 0, "registrados": 0, "errores_registro": 0,
+            "registro_saturado": 0,
+        }
+
+    def _restantes(self):
+        return sum(fin - siguiente for siguiente, fin in self._rangos)
+
+    def emitir(self, nombre_acta, user_id=None):
+        """Folio nuevo para `nombre_acta`, anotado para el registro."""
+        if len(self._pendientes) >= FOLIO_REGISTRO_MAX_PENDIENTES:
+            # Antes de rechazar se intenta escribir lo pendiente: la base pudo volver
+            try:
+                self.vaciar_registro()
+            except Exception:
+                pass  # vaciar_registro ya lo reportó
+        while True:
+            with self._lock:
+                if len(self._pendientes) >= FOLIO_REGISTRO_MAX_PENDIENTES:
+                    self._metricas["registro_saturado"] += 1
+                    raise RegistroSaturado(
+                        f"{len(self._pendientes)} folios emitidos sin registrar en folios_emitidos; no se emiten más."
+                    )
+                if self._rangos:
+                    rango = self._rangos[0]
+                    folio = rango[0]
+                    rango[0] += 1
+                    if rango[0] == rango[1]:
+                        self._rangos.popleft()
+                    emitido = datetime.now().isoformat(sep=" ", timespec="milliseconds")
+                    self._pendientes.append((folio, nombre_acta[:NOMBRE_ACTA_MAX], user_id, emitido))
+                    self._metricas["emitidos"] += 1
+                    adelantar = self._restantes() < self.bloque // 2
+                    break
+                self._metricas["reservas_en_espera"] += 1
+            # Sin folios en memoria (primer uso, o el hilo no alcanzó): reservar aquí
+            self._reservar(adelantado=False)
+        self._iniciar_hilo()
+        if adelantar:
+            self._despertar.set()
+        return folio
+
+    def _reservar(self, adelantado):
+        with self._reserva_lock:
+            with self._lock:
+                # Otro hilo pudo reservar mientras se esperaba el candado
+                if (self._restantes() >= self.bloque // 2) if adelantado else self._rangos:
+                    return
+            inicio = reservar_bloque(self.serie, self.bloque)
+            with self._lock:
+                self._rangos.append([inicio, inicio + self.bloque])
+                self._metricas["bloques"] += 1
+
+    def vaciar_registro(self):
+        """Escribe las emisiones pendientes en folios_emitidos. Devuelve cuántas."""
+        with self._registro_lock:
+            with self._lock:
+                filas, self._pendientes = self._pendientes, []
+            if not filas:
+                return 0
+            try:
+                registrar_emisiones(self.serie, filas)
+            except Exception as e:
+                # Se conservan para el siguiente intento, delante de las nuevas
+                with self._lock:
+                    self._pendientes[:0] = filas
+                    self._metricas["errores_registro"] += 1
+                    pendientes = len(self._pendientes)
+                print(f"ERROR: no se pudieron registrar {len(filas)} folios emitidos ({pendientes} por registrar): {e}")
+                raise
+            with self._lock:
+                self._metricas["registrados"] += len(filas)
+            return len(filas)
+
+    def _iniciar_hilo(self):
+        if self._hilo is None:
+            with self._lock:
+                if self._hilo is None:
+                    self._hilo = threading.Thread(target=self._trabajar, name="folios", daemon=True)
+                    self._hilo.start()
+
+    def _trabajar(self):
+        while True:
+            self._despertar.wait(self.intervalo)
+            self._despertar.clear()
+            try:
+                self._reservar(adelantado=True)
+                self.vaciar_registro()
+            except Exception as e:
+                print(f"Error en el asignador de folios: {e}")
+
+    def cerrar(self):
+        """Escribe lo pendiente del registro (al terminar el proceso)."""
+        try:
+            self.vaciar_registro()
+        except Exception as e:
+            print(f"No se pudieron registrar {len(self._pendientes)} folios emitidos: {e}")
+
+    def estadisticas(self):
+        """Folios emitidos, bloques reservados, folios disponibles y emisiones por registrar."""
+        with self._lock:
+            metricas = dict(self._metricas)
+            metricas["disponibles"] = self._restantes()
+            metricas["pendientes_registro"] = len(self._pendientes)
+        return metricas
+
+
+_asignador = None
+_asignador_lock = threading.Lock()
+
+
+def obtener_asignador():
+    """Asignador del proceso, creado en el primer uso."""
+    global _asignador
+    with _asignador_lock:
+        if _asignador is None:
+            _asignador = AsignadorFolios()
+            # Los finalizadores de multiprocessing corren al salir tanto el proceso
+            # principal como los del pool de lotes (que no ejecutan atexit)
+            multiprocessing.util.Finalize(None, _asignador.cerrar, exitpriority=10)
+        return _asignador
+
+
+def emitir_folio(nombre_acta, user_id=None):
+    """Folio único para `nombre_acta` emitido por el asignador del proceso."""
+    return obtener_asignador().emitir(nombre_acta, user_id)
+
+
+def asentar_emisiones():
+    """Con FOLIO_REGISTRO_SINCRONO escribe ya en folios_emitidos lo emitido (antes de entregar el PDF)."""
+    if FOLIO_REGISTRO_SINCRONO:
+        obtener_asignador().vaciar_registro()
+
+
+def preparar_folios():
+    """Reserva el primer bloque de folios del proceso (parte del calentamiento)."""
+    obtener_asignador()._reservar(adelantado=False)
+
+
+def estadisticas():
+    """Contadores del asignador del proceso."""
+    return obtener_asignador().estadisticas()
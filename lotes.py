@@ -0,0 +1,303 @@
+import os
+import json
+import zipfile
+import threading
+import multiprocessing
+from io import BytesIO
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import cargas
+
+# Procesamiento de lotes de actas en paralelo.
+# PyMuPDF es intensivo en CPU y no libera el GIL, así que cada acta se enmarca en
+# un proceso del pool; el proceso principal solo reparte el trabajo y arma la salida.
+# Las entradas se leen y los resultados se entregan de forma perezosa: en memoria
+# solo hay, como máximo, las actas que caben en la ventana de trabajo en vuelo.
+# Si un proceso del pool muere (MuPDF falla con una carga hostil, el OOM killer)
+# el pool queda roto: las actas que tenía en vuelo fallan y el siguiente envío
+# lo reemplaza por uno nuevo.
+
+PROCESOS = int(os.getenv("ENMARCADO_PROCESOS", "0")) or os.cpu_count() or 1
+MP_CONTEXT = os.getenv("ENMARCADO_MP_CONTEXT", "spawn")
+LOTE_MAX_ARCHIVOS = int(os.getenv("LOTE_MAX_ARCHIVOS", "500"))
+# Actas enviadas al pool por delante de la que se está entregando
+LOTE_VENTANA = int(os.getenv("LOTE_VENTANA", "0")) or PROCESOS
+# Procesos del pool que se arrancan al iniciar el servidor (0: ninguno; el pool
+# se crea con el primer lote o trabajo). Cada proceso reimporta la app y tiene
+# sus propias cachés y su bloque de folios: solo conviene donde hay lotes o
+# trabajos en cola y memoria para tenerlos ociosos.
+CALENTAR_PROCESOS = min(int(os.getenv("ENMARCADO_CALENTAR_PROCESOS", "0")), PROCESOS)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _inicializar_proceso():
+    """Calienta cada proceso del pool (plantillas, fuentes, QR y código de barras)."""
+    from enmarcado import warm_up
+    warm_up()
+
+
+def obtener_pool():
+    """Devuelve el pool de procesos compartido, creándolo en el primer uso."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=PROCESOS,
+                mp_context=multiprocessing.get_context(MP_CONTEXT),
+                initializer=_inicializar_proceso,
+            )
+        return _pool
+
+
+def _descartar_pool(pool):
+    """Retira un pool roto para que el siguiente obtener_pool() cree otro."""
+    global _pool
+    with _pool_lock:
+        if _pool is not pool:
+            return  # Otro hilo ya lo reemplazó
+        _pool = None
+    print("El pool de procesos quedó roto (murió un proceso); se crea uno nuevo.")
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def enviar(funcion, *args):
+    """Envía una tarea al pool; si está roto lo reemplaza y la envía al nuevo."""
+    pool = obtener_pool()
+    try:
+        return pool.submit(funcion, *args)
+    except BrokenProcessPool:
+        _descartar_pool(pool)
+        return obtener_pool().submit(funcion, *args)
+
+
+def _proceso_listo():
+    return os.getpid()
+
+
+def calentar_pool(procesos=CALENTAR_PROCESOS):
+    """Arranca `procesos` procesos del pool para que se calienten en paralelo.
+
+    Devuelve los futuros; al terminar todos, esos procesos ya están listos para
+    enmarcar. El pool arranca un proceso por envío mientras no tenga uno libre,
+    así que `procesos` envíos seguidos arrancan a lo más ese número.
+    """
+    return [enviar(_proceso_listo) for _ in range(procesos)]
+
+
+def cerrar_pool():
+    """Detiene el pool de procesos si está activo."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+            _pool = None
+
+
+def enmarcar_archivo(tarea):
+    """Enmarca un acta dentro de un proceso del pool.
+
+    Devuelve (nombre, éxito, mensaje, bytes, observaciones); las observaciones son
+    los tiempos por etapa, que el proceso principal incorpora a sus métricas.
+    """
+    from werkzeug.datastructures import FileStorage
+    from enmarcado import overlay_pdf_on_background
+    from metricas import capturar, medir
+
+    nombre, datos, apply_front, apply_rear, apply_folio, save_profile, pages_per_acta, user_id = tarea
+    output_stream = BytesIO()
+    # `datos` son los bytes del acta o, para los trabajos en cola, la ruta de su carga en disco
+    with (open(datos, 'rb') if isinstance(datos, str) else BytesIO(datos)) as entrada:
+        with capturar() as observaciones, medir("total"):
+            success, message = overlay_pdf_on_background(
+                FileStorage(entrada, filename=nombre), output_stream, apply_front, apply_rear, apply_folio, save_profile, pages_per_acta, user_id
+            )
+    return nombre, success, message, output_stream.getvalue() if success else None, observaciones
+
+
+def resultado_con_metricas(resultado):
+    """Incorpora las métricas del proceso del pool y devuelve (nombre, éxito, mensaje, bytes)."""
+    from metricas import incorporar
+
+    nombre, success, message, datos, observaciones = resultado
+    incorporar(observaciones)
+    return nombre, success, message, datos
+
+
+def _opcion_activa(valor):
+    return valor is True or valor == 'on' or valor == '1' or valor == 'true'
+
+
+def leer_opciones(form):
+    """Lee las opciones compartidas y las particulares por archivo (campo JSON `opciones`)."""
+    compartidas = {
+        'front_frame': form.get('front_frame') == 'on',
+        'rear_frame': form.get('rear_frame') == 'on',
+        'folio': form.get('folio') == 'on',
+    }
+    por_archivo = {}
+    if form.get('opciones'):
+        try:
+            crudas = json.loads(form['opciones'])
+        except ValueError:
+            raise ValueError("El campo 'opciones' no es un JSON válido.")
+        if not isinstance(crudas, dict):
+            raise ValueError("El campo 'opciones' debe ser un objeto {archivo: opciones}.")
+        for nombre, opciones in crudas.items():
+            if not isinstance(opciones, dict):
+                raise ValueError(f"Opciones inválidas para {nombre}.")
+            por_archivo[nombre] = {
+                clave: _opcion_activa(opciones[clave]) if clave in opciones else compartidas[clave]
+                for clave in compartidas
+            }
+    return compartidas, por_archivo
+
+
+def _agregar_archivo(archivos, nombre, lector, rechazo):
+    """Agrega el archivo al lote; uno que excede el tamaño rechaza el lote completo."""
+    if rechazo is not None and rechazo[1] == 413:
+        raise ValueError(f"El archivo {nombre} excede el tamaño permitido.")
+    archivos.append((nombre, lector, rechazo[0] if rechazo else None))
+
+
+def leer_archivos(files):
+    """Obtiene (nombre, lector, rechazo) de los PDF enviados en `pdf_files` y dentro de `zip_file`.
+
+    `lector` es una función sin argumentos que devuelve los bytes del archivo; así
+    cada acta se lee hasta el momento de enviarla al pool. Cada archivo pasa las
+    mismas revisiones que una carga individual (cargas.rechazo_contenido) antes de
+    leerlo: `rechazo` es el mensaje de un archivo que no es PDF, que se reporta como
+    error del acta sin enviarlo al pool.
+    """
+    archivos = []
+    for pdf_file in files.getlist('pdf_files'):
+        if pdf_file.filename:
+            _agregar_archivo(archivos, os.path.basename(pdf_file.filename), pdf_file.read, cargas.rechazo_carga(pdf_file))
+
+    zip_file = files.get('zip_file')
+    if zip_file is not None and zip_file.filename:
+        try:
+            zf = zipfile.ZipFile(zip_file.stream)
+        except zipfile.BadZipFile:
+            raise ValueError("El archivo ZIP está dañado o no es válido.")
+        for info in zf.infolist():
+            if info.is_dir() or not info.filename.lower().endswith('.pdf'):
+                continue
+            with zf.open(info) as miembro:
+                inicio = miembro.read(cargas.VENTANA_ENCABEZADO)
+            _agregar_archivo(
+                archivos, os.path.basename(info.filename), lambda info=info: zf.read(info),
+                cargas.rechazo_contenido(info.file_size, inicio),
+            )
+
+    if len(archivos) > LOTE_MAX_ARCHIVOS:
+        raise ValueError(f"El lote excede el máximo de {LOTE_MAX_ARCHIVOS} archivos.")
+    return archivos
+
+
+def _resultado_del_pool(nombre, futuro):
+    """Resultado del acta; si murió el proceso del pool, solo esta acta queda con error."""
+    try:
+        return resultado_con_metricas(futuro.result())
+    except BrokenProcessPool:
+        return nombre, False, "El proceso que enmarcaba el acta terminó inesperadamente.", None
+
+
+def iterar_lote(archivos, compartidas, por_archivo, save_profile=None, pages_per_acta=0, user_id=None):
+    """Genera los resultados en el orden de entrada con a lo sumo LOTE_VENTANA actas en vuelo."""
+    pendientes = deque()
+    try:
+        for nombre, lector, rechazo in archivos:
+            if rechazo is not None:
+                futuro = Future()
+                futuro.set_result((nombre, False, rechazo, None, ()))
+            else:
+                opciones = por_archivo.get(nombre, compartidas)
+                tarea = (nombre, lector(), opciones['front_frame'], opciones['rear_frame'], opciones['folio'], save_profile, pages_per_acta, user_id)
+                futuro = enviar(enmarcar_archivo, tarea)
+            pendientes.append((nombre, futuro))
+            if len(pendientes) >= LOTE_VENTANA:
+                yield _resultado_del_pool(*pendientes.popleft())
+        while pendientes:
+            yield _resultado_del_pool(*pendientes.popleft())
+    finally:
+        # Si el cliente se desconecta no tiene caso seguir enmarcando
+        for _, futuro in pendientes:
+            futuro.cancel()
+
+
+def _nombre_salida(nombre, usados):
+    """Nombre de salida único dentro del ZIP (los lotes pueden repetir nombres)."""
+    candidato = f"_{nombre}"
+    base, extension = os.path.splitext(candidato)
+    contador = 1
+    while candidato in usados:
+        candidato = f"{base}({contador}){extension}"
+        contador += 1
+    usados.add(candidato)
+    return candidato
+
+
+class _SalidaZip:
+    """Destino de solo escritura para zipfile: acumula bytes hasta que el generador los entrega."""
+
+    def __init__(self):
+        self._partes = []
+
+    def write(self, datos):
+        self._partes.append(datos)
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        datos = b"".join(self._partes)
+        self._partes = []
+        return datos
+
+
+def generar_zip(resultados):
+    """Genera el ZIP por partes: cada PDF se entrega en cuanto está listo.
+
+    Como el destino no admite seek, zipfile escribe descriptores de datos al final
+    de cada entrada y el índice central al cerrar; los errores van en errores.txt.
+    """
+    salida = _SalidaZip()
+    errores = []
+    usados = set()
+    with zipfile.ZipFile(salida, 'w', compression=zipfile.ZIP_STORED) as zf:
+        for nombre, success, message, datos in resultados:
+            if success:
+                zf.writestr(_nombre_salida(nombre, usados), datos)
+                del datos
+                yield salida.vaciar()
+            else:
+                errores.append(f"{nombre}: {message}")
+        if errores:
+            zf.writestr('errores.txt', "\n".join(errores))
+    yield salida.vaciar()
+
+
+def armar_pdf_unico(resultados, save_profile=None):
+    """Une todos los PDF generados en un solo documento."""
+    import fitz  # PyMuPDF para manejar PDFs
+    from enmarcado import SAVE_PROFILES, DEFAULT_SAVE_PROFILE
+
+    errores = []
+    merged_pdf = fitz.open()
+    for nombre, success, message, datos in resultados:
+        if not success:
+            errores.append(f"{nombre}: {message}")
+            continue
+        with fitz.open(stream=datos, filetype="pdf") as framed_pdf:
+            merged_pdf.insert_pdf(framed_pdf)
+    output_stream = BytesIO()
+    if len(merged_pdf) > 0:
+        merged_pdf.save(output_stream, **SAVE_PROFILES[save_profile or DEFAULT_SAVE_PROFILE])
+    merged_pdf.close()
+    output_stream.seek(0)
+    return output_stream, errores
@@ -0,0 +1,137 @@
+import os
+import json
+import time
+import bisect
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Métricas de la aplicación en formato de texto de Prometheus.
+# Cada etapa del enmarcado se mide con `medir(etapa)` y se acumula en un
+# histograma; otros módulos (cachés, pool de conexiones, cola de trabajos)
+# registran funciones que devuelven sus contadores al momento de exportar.
+# Con ENMARCADO_TRAZA=1 además se imprime una línea JSON por solicitud con la
+# duración de cada etapa.
+
+TRAZA = os.getenv("ENMARCADO_TRAZA", "0") == "1"
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+HISTOGRAMA_ETAPAS = "enmarcado_etapa_segundos"
+
+
+class Histograma:
+    """Histograma acumulativo con cubetas fijas, separado por etiqueta."""
+
+    def __init__(self, nombre, ayuda, buckets=BUCKETS):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observar(self, etiqueta, valor):
+        with self._lock:
+            serie = self._series.get(etiqueta)
+            if serie is None:
+                serie = self._series[etiqueta] = [[0] * len(self.buckets), 0.0, 0]
+            indice = bisect.bisect_left(self.buckets, valor)
+            if indice < len(self.buckets):
+                serie[0][indice] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    def exportar(self, clave_etiqueta):
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} histogram"]
+        with self._lock:
+            series = {etiqueta: ([*conteos], suma, total) for etiqueta, (conteos, suma, total) in self._series.items()}
+        for etiqueta in sorted(series):
+            conteos, suma, total = series[etiqueta]
+            acumulado = 0
+            for limite, conteo in zip(self.buckets, conteos):
+                acumulado += conteo
+                lineas.append(f'{self.nombre}_bucket{{{clave_etiqueta}="{etiqueta}",le="{limite}"}} {acumulado}')
+            lineas.append(f'{self.nombre}_bucket{{{clave_etiqueta}="{etiqueta}",le="+Inf"}} {total}')
+            lineas.append(f'{self.nombre}_sum{{{clave_etiqueta}="{etiqueta}"}} {suma:.6f}')
+            lineas.append(f'{self.nombre}_count{{{clave_etiqueta}="{etiqueta}"}} {total}')
+        return lineas
+
+
+etapas = Histograma(HISTOGRAMA_ETAPAS, "Duración de cada etapa del enmarcado en segundos.")
+
+_traza = contextvars.ContextVar("traza_enmarcado", default=None)
+_colectores = []
+
+
+@contextmanager
+def medir(etapa):
+    """Mide la duración del bloque y la registra en el histograma de etapas."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        duracion = time.perf_counter() - inicio
+        etapas.observar(etapa, duracion)
+        traza = _traza.get()
+        if traza is not None:
+            traza.append((etapa, duracion))
+
+
+@contextmanager
+def capturar():
+    """Junta las observaciones del bloque en una lista (para enviarlas desde un proceso del pool)."""
+    observaciones = []
+    token = _traza.set(observaciones)
+    try:
+        yield observaciones
+    finally:
+        _traza.reset(token)
+
+
+def incorporar(observaciones):
+    """Registra observaciones capturadas en otro proceso."""
+    for etapa, duracion in observaciones or ():
+        etapas.observar(etapa, duracion)
+
+
+@contextmanager
+def trazar(nombre):
+    """Con ENMARCADO_TRAZA=1 imprime al final una línea JSON con las etapas de la solicitud."""
+    if not TRAZA:
+        yield
+        return
+    with capturar() as observaciones:
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            print(json.dumps({
+                "traza": nombre,
+                "total_ms": round((time.perf_counter() - inicio) * 1000, 3),
+                "etapas_ms": [[etapa, round(duracion * 1000, 3)] for etapa, duracion in observaciones],
+            }, ensure_ascii=False))
+
+
+def registrar_colector(nombre, ayuda, tipo, funcion, clave_etiqueta=None):
+    """Registra una métrica calculada al exportar.
+
+    `funcion` devuelve un número, o un dict {etiqueta: número} si se indica `clave_etiqueta`.
+    """
+    _colectores.append((nombre, ayuda, tipo, funcion, clave_etiqueta))
+
+
+def exportar_prometheus():
+    """Todas las métricas en formato de texto de Prometheus."""
+    lineas = etapas.exportar("etapa")
+    for nombre, ayuda, tipo, funcion, clave_etiqueta in _colectores:
+        try:
+            valor = funcion()
+        except Exception as e:
+            print(f"Error leyendo la métrica {nombre}: {e}")
+            continue
+        lineas.append(f"# HELP {nombre} {ayuda}")
+        lineas.append(f"# TYPE {nombre} {tipo}")
+        if clave_etiqueta is None:
+            lineas.append(f"{nombre} {valor}")
+        else:
+            for etiqueta, numero in sorted(valor.items()):
+                lineas.append(f'{nombre}{{{clave_etiqueta}="{etiqueta}"}} {numero}')
+    return "\n".join(lineas) + "\n"
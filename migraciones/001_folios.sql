@@ -0,0 +1,28 @@
+-- Folios de las actas: secuencia por serie y registro de emisiones.
+-- Cada proceso reserva bloques de la secuencia (folios.py); el registro solo
+-- admite inserciones.
+
+CREATE TABLE IF NOT EXISTS folio_secuencia (
+    serie VARCHAR(16) NOT NULL PRIMARY KEY,
+    siguiente BIGINT NOT NULL  -- Primer folio aún no reservado
+) ENGINE=InnoDB;
+
+-- Los folios aleatorios anteriores eran de 6 dígitos (100000-999999): la secuencia
+-- empieza después de ellos para no repetir ninguno ya impreso
+INSERT IGNORE INTO folio_secuencia (serie, siguiente) VALUES ('A30', 1000000);
+
+CREATE TABLE IF NOT EXISTS folios_emitidos (
+    serie VARCHAR(16) NOT NULL,
+    folio BIGINT NOT NULL,
+    nombre_acta VARCHAR(255) NOT NULL,
+    user_id INT NULL,
+    emitido DATETIME(3) NOT NULL,
+    PRIMARY KEY (serie, folio),
+    KEY idx_folios_emitidos_user (user_id, emitido)
+) ENGINE=InnoDB;
+
+CREATE TRIGGER folios_emitidos_sin_cambios BEFORE UPDATE ON folios_emitidos
+FOR EACH ROW SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'folios_emitidos solo admite inserciones';
+
+CREATE TRIGGER folios_emitidos_sin_borrado BEFORE DELETE ON folios_emitidos
+FOR EACH ROW SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'folios_emitidos solo admite inserciones';
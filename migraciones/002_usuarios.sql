@@ -0,0 +1,8 @@
+-- Índices del listado de usuarios (paginación por nombre, usuarios.py) y del login.
+-- nombre_usuario pasa a ser único: antes de aplicar, revisar que no haya repetidos con
+--   SELECT nombre_usuario, COUNT(*) FROM usuarios GROUP BY nombre_usuario HAVING COUNT(*) > 1;
+
+ALTER TABLE usuarios
+    ADD UNIQUE KEY uq_usuarios_nombre (nombre_usuario),
+    ADD KEY idx_usuarios_rol (rol, nombre_usuario),
+    ADD KEY idx_usuarios_activo (activo, nombre_usuario);
@@ -0,0 +1,106 @@
+import os
+import threading
+import time
+import fitz  # PyMuPDF para manejar PDFs
+
+# Registro en memoria de las plantillas PDF (marco delantero y marcos traseros).
+# Cada plantilla se abre una sola vez y queda residente; si el archivo cambia en
+# disco (mtime distinto) se vuelve a cargar en la siguiente consulta. La versión
+# anterior no se cierra: otras solicitudes pueden tenerla en uso (o esperando su
+# candado), y el documento se libera solo cuando ya nadie la referencia.
+# Además de la plantilla original se guarda un "esqueleto": un documento donde
+# cada página ya es un Form XObject con el marco, de modo que cada solicitud solo
+# clona esas páginas en lugar de volver a componerlas con show_pdf_page.
+
+# Cada cuántos segundos se revisa el mtime de una plantilla ya cargada
+REVISION_SEGUNDOS = float(os.getenv("PLANTILLAS_REVISION_SEGUNDOS", "5"))
+
+
+class Plantilla:
+    """Documento PDF de plantilla abierto y listo para reutilizarse."""
+
+    def __init__(self, ruta, doc, mtime):
+        self.ruta = ruta
+        self.doc = doc
+        self.mtime = mtime
+        self.revisado = time.monotonic()
+        self._esqueleto = None
+        # PyMuPDF no es seguro entre hilos: el documento compartido se usa bajo este candado
+        self.lock = threading.Lock()
+
+    @property
+    def version(self):
+        """Identificador de la versión cargada (cambia cuando cambia el archivo)."""
+        return f"{os.path.basename(self.ruta)}:{self.mtime}"
+
+    def esqueleto(self):
+        """Documento con cada página de la plantilla convertida en Form XObject (usar bajo `lock`)."""
+        if self._esqueleto is None:
+            esqueleto = fitz.open()
+            for page_num in range(len(self.doc)):
+                rect = self.doc[page_num].rect
+                new_page = esqueleto.new_page(width=rect.width, height=rect.height)
+                new_page.show_pdf_page(new_page.rect, self.doc, page_num)
+            self._esqueleto = esqueleto
+        return self._esqueleto
+
+
+_plantillas = {}
+_faltantes = {}
+_registro_lock = threading.Lock()
+
+
+def _leer_mtime(ruta):
+    try:
+        return os.stat(ruta).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _cargar(ruta, mtime):
+    _plantillas.pop(ruta, None)  # Sin cerrarla: quien ya la obtuvo termina con esa versión
+    if mtime is None:
+        _faltantes[ruta] = time.monotonic()
+        return None
+    _faltantes.pop(ruta, None)
+    plantilla = Plantilla(ruta, fitz.open(ruta), mtime)
+    with plantilla.lock:
+        plantilla.esqueleto()
+    _plantillas[ruta] = plantilla
+    return plantilla
+
+
+def obtener_plantilla(ruta):
+    """Devuelve la plantilla cargada para `ruta` o None si el archivo no existe."""
+    ahora = time.monotonic()
+    plantilla = _plantillas.get(ruta)
+    if plantilla is not None and ahora - plantilla.revisado < REVISION_SEGUNDOS:
+        return plantilla
+    faltante = _faltantes.get(ruta)
+    if plantilla is None and faltante is not None and ahora - faltante < REVISION_SEGUNDOS:
+        return None
+
+    with _registro_lock:
+        plantilla = _plantillas.get(ruta)
+        mtime = _leer_mtime(ruta)
+        if plantilla is not None and plantilla.mtime == mtime:
+            plantilla.revisado = ahora
+            return plantilla
+        return _cargar(ruta, mtime)
+
+
+def precargar_plantillas(rutas):
+    """Carga de antemano todas las plantillas indicadas. Devuelve cuántas quedaron residentes."""
+    cargadas = 0
+    for ruta in rutas:
+        if obtener_plantilla(ruta) is not None:
+            cargadas += 1
+    return cargadas
+
+
+def limpiar_plantillas():
+    """Descarta todas las plantillas residentes (se liberan al dejar de usarse)."""
+    with _registro_lock:
+        for ruta in list(_plantillas):
+            _cargar(ruta, None)
+        _faltantes.clear()
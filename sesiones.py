@@ -0,0 +1,135 @@
+import os
+import time
+import threading
+
+# Caché en proceso de la validación de sesiones.
+# La ruta principal compara el token de la sesión con el de la base de datos en
+# cada visita; aquí se guarda (session_token, activo, rol) por usuario durante
+# unos segundos. Las rutas que cambian esos datos (login, logout, edición,
+# activación y borrado de usuarios) invalidan la entrada en el acto, pero solo en
+# su proceso. Por eso la caché únicamente evita la consulta cuando la sesión
+# valida: una entrada que la rechazaría (otro token, usuario inactivo) se vuelve a
+# comprobar en la base, y el TTL solo acota el tiempo que otro proceso podría
+# seguir aceptando una sesión ya revocada.
+
+SESION_CACHE_TTL = float(os.getenv("SESION_CACHE_TTL", "30"))
+
+_sesiones = {}
+_sesiones_lock = threading.Lock()
+
+
+def obtener_sesion(user_id):
+    """Datos en caché del usuario ({session_token, activo, rol}) o None si no hay o vencieron."""
+    entrada = _sesiones.get(user_id)
+    if entrada is None:
+        return None
+    datos, expira = entrada
+    if time.monotonic() >= expira:
+        with _sesiones_lock:
+            if _sesiones.get(user_id) is entrada:
+                del _sesiones[user_id]
+        return None
+    return datos
+
+
+def guardar_sesion(user_id, datos):
+    """Guarda los datos de validación del usuario durante SESION_CACHE_TTL segundos."""
+    if SESION_CACHE_TTL <= 0:
+        return
+    with _sesiones_lock:
+        _sesiones[user_id] = (datos, time.monotonic() + SESION_CACHE_TTL)
+
+
+def invalidar_sesion(user_id):
+    """Descarta la entrada del usuario para que la siguiente visita consulte la base de datos."""
+    with _sesiones_lock:
+        _sesiones.pop(user_id, None)
+
+
+# Registro de sesiones activas (user_id → sid de SocketIO) para forzar el cierre
+# de sesión cuando la cuenta se abre en otro dispositivo.
+# Con un solo proceso basta el registro en memoria; con varios workers se usa un
+# archivo SQLite compartido (SESIONES_BACKEND=sqlite) y SocketIO debe configurarse
+# con una cola de mensajes (SOCKETIO_MESSAGE_QUEUE, p. ej. redis://...) para que
+# el aviso llegue al worker que tiene el socket.
+
+SESIONES_BACKEND = os.getenv("SESIONES_BACKEND", "memoria")
+SESIONES_SQLITE_PATH = os.getenv("SESIONES_SQLITE_PATH", "sesiones_activas.db")
+
+
+class RegistroMemoria:
+    """Registro de sesiones activas en un diccionario del proceso."""
+
+    def __init__(self):
+        self._sids = {}
+        self._lock = threading.Lock()
+
+    def obtener(self, user_id):
+        """sid registrado para el usuario o None."""
+        return self._sids.get(user_id)
+
+    def registrar(self, user_id, sid):
+        """Registra `sid` como la sesión del usuario y devuelve la anterior (o None)."""
+        with self._lock:
+            anterior = self._sids.get(user_id)
+            self._sids[user_id] = sid
+        return anterior
+
+    def eliminar(self, user_id, sid=None):
+        """Quita la sesión del usuario; si se indica `sid`, solo si sigue siendo la registrada."""
+        with self._lock:
+            if user_id in self._sids and (sid is None or self._sids[user_id] == sid):
+                del self._sids[user_id]
+
+
+class RegistroSQLite:
+    """Registro de sesiones activas compartido entre procesos mediante un archivo SQLite."""
+
+    def __init__(self, ruta):
+        import sqlite3
+        self._sqlite3 = sqlite3
+        self._ruta = ruta
+        self._local = threading.local()
+        self._conexion().execute(
+            "CREATE TABLE IF NOT EXISTS sesiones_activas (user_id INTEGER PRIMARY KEY, sid TEXT NOT NULL)"
+        )
+
+    def _conexion(self):
+        conexion = getattr(self._local, 'conexion', None)
+        if conexion is None:
+            conexion = self._sqlite3.connect(self._ruta, timeout=10, isolation_level=None)
+            conexion.execute("PRAGMA journal_mode=WAL")
+            self._local.conexion = conexion
+        return conexion
+
+    def obtener(self, user_id):
+        fila = self._conexion().execute("SELECT sid FROM sesiones_activas WHERE user_id = ?", (user_id,)).fetchone()
+        return fila[0] if fila else None
+
+    def registrar(self, user_id, sid):
+        conexion = self._conexion()
+        # BEGIN IMMEDIATE toma el candado de escritura: leer y reemplazar es atómico entre procesos
+        conexion.execute("BEGIN IMMEDIATE")
+        try:
+            fila = conexion.execute("SELECT sid FROM sesiones_activas WHERE user_id = ?", (user_id,)).fetchone()
+            conexion.execute("INSERT OR REPLACE INTO sesiones_activas (user_id, sid) VALUES (?, ?)", (user_id, sid))
+            conexion.execute("COMMIT")
+        except Exception:
+            conexion.execute("ROLLBACK")
+            raise
+        return fila[0] if fila else None
+
+    def eliminar(self, user_id, sid=None):
+        if sid is None:
+            self._conexion().execute("DELETE FROM sesiones_activas WHERE user_id = ?", (user_id,))
+        else:
+            self._conexion().execute("DELETE FROM sesiones_activas WHERE user_id = ? AND sid = ?", (user_id, sid))
+
+
+def crear_registro():
+    """Crea el registro de sesiones activas según SESIONES_BACKEND."""
+    if SESIONES_BACKEND == "sqlite":
+        return RegistroSQLite(SESIONES_SQLITE_PATH)
+    if SESIONES_BACKEND != "memoria":
+        raise ValueError(f"SESIONES_BACKEND desconocido: {SESIONES_BACKEND}")
+    return RegistroMemoria()
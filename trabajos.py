@@ -0,0 +1,288 @@
+import os
+import json
+import time
+import uuid
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import Future
+
+import lotes
+
+# Cola de trabajos de enmarcado en segundo plano.
+# La carga devuelve de inmediato un id de trabajo; el render se hace en el pool de
+# procesos de `lotes` y el avance se notifica al socket del usuario. El PDF
+# terminado queda en TRABAJOS_DIR para descargarse por id.
+# La carga de un trabajo en cola espera en TRABAJOS_DIR (<id>.carga), no en
+# memoria: el proceso del pool la abre desde el disco y se borra al terminar.
+# TRABAJOS_DIR se barre por fecha de modificación, así que también se eliminan
+# los archivos que dejaron otros workers o una ejecución anterior.
+# El despacho es equitativo: se atiende a los usuarios por turnos (round robin) y
+# cada uno tiene un tope de trabajos en proceso y en cola, además del tope global.
+
+TRABAJOS_DIR = os.getenv("TRABAJOS_DIR") or os.path.join(tempfile.gettempdir(), "enmarcado_trabajos")
+TRABAJOS_CONCURRENCIA = int(os.getenv("TRABAJOS_CONCURRENCIA", "0")) or lotes.PROCESOS
+TRABAJOS_MAX_COLA = int(os.getenv("TRABAJOS_MAX_COLA", "200"))  # Trabajos en cola, todos los usuarios
+TRABAJOS_POR_USUARIO = int(os.getenv("TRABAJOS_POR_USUARIO", "2"))  # En proceso simultáneo por usuario
+TRABAJOS_COLA_POR_USUARIO = int(os.getenv("TRABAJOS_COLA_POR_USUARIO", "20"))  # En cola por usuario
+TRABAJOS_RETENCION = float(os.getenv("TRABAJOS_RETENCION", "3600"))  # Segundos que se conserva el resultado
+TRABAJOS_BARRIDO = 60  # Segundos mínimos entre barridos de TRABAJOS_DIR
+
+EN_COLA = "en_cola"
+PROCESANDO = "procesando"
+TERMINADO = "terminado"
+ERROR = "error"
+
+
+class ColaLlena(Exception):
+    """La cola global o la del usuario alcanzó su límite."""
+
+
+class Trabajo:
+    """Estado de un trabajo de enmarcado."""
+
+    def __init__(self, user_id, nombre, tarea):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.nombre = nombre
+        self.tarea = tarea
+        self.estado = EN_COLA
+        self.mensaje = ""
+        self.creado = time.time()
+        self.terminado = None
+
+    @property
+    def ruta_resultado(self):
+        return os.path.join(TRABAJOS_DIR, f"{self.id}.pdf")
+
+    @property
+    def ruta_carga(self):
+        return os.path.join(TRABAJOS_DIR, f"{self.id}.carga")
+
+    def a_dict(self):
+        return {
+            "id": self.id,
+            "user_id": self.user_id,
+            "nombre": self.nombre,
+            "estado": self.estado,
+            "mensaje": self.mensaje,
+            "creado": self.creado,
+            "terminado": self.terminado,
+        }
+
+
+_trabajos = {}
+_pendientes = {}  # user_id → deque de trabajos en cola
+_turnos = deque()  # user_id con trabajos en cola, en orden de atención
+_en_proceso = {}  # user_id → trabajos en proceso
+_lock = threading.Lock()
+_notificar = None
+_barrido = 0.0
+
+
+def configurar_notificador(notificar):
+    """Define la función notificar(user_id, evento, datos) usada para avisar el avance."""
+    global _notificar
+    _notificar = notificar
+
+
+def _avisar(trabajo, evento):
+    if _notificar is None:
+        return
+    try:
+        _notificar(trabajo.user_id, evento, trabajo.a_dict())
+    except Exception as e:
+        print(f"Error notificando el trabajo {trabajo.id}: {e}")
+
+
+def _en_cola_total():
+    return sum(len(cola) for cola in _pendientes.values())
+
+
+def encolar(user_id, nombre, pdf_file, apply_front, apply_rear, apply_folio, save_profile=None, pages_per_acta=0):
+    """Guarda la carga en TRABAJOS_DIR, registra el trabajo y lo despacha en cuanto haya lugar. Devuelve el Trabajo."""
+    _purgar_vencidos()
+    with _lock:
+        _revisar_cupo(user_id)
+    trabajo = Trabajo(user_id, nombre, None)
+    os.makedirs(TRABAJOS_DIR, exist_ok=True)
+    pdf_file.stream.seek(0)
+    pdf_file.save(trabajo.ruta_carga)
+    trabajo.tarea = (nombre, trabajo.ruta_carga, apply_front, apply_rear, apply_folio, save_profile, pages_per_acta, user_id)
+    with _lock:
+        try:
+            _revisar_cupo(user_id)  # Otra carga pudo ocupar el lugar mientras se guardaba esta
+        except ColaLlena:
+            _borrar(trabajo.ruta_carga)
+            raise
+        cola = _pendientes.setdefault(user_id, deque())
+        cola.append(trabajo)
+        if user_id not in _turnos:
+            _turnos.append(user_id)
+        _trabajos[trabajo.id] = trabajo
+    _avisar(trabajo, 'trabajo_progreso')
+    _despachar()
+    return trabajo
+
+
+def _revisar_cupo(user_id):
+    """Lanza ColaLlena si no cabe otro trabajo del usuario (bajo _lock)."""
+    if _en_cola_total() >= TRABAJOS_MAX_COLA:
+        raise ColaLlena("La cola de trabajos está llena, intenta más tarde.")
+    if len(_pendientes.get(user_id, ())) >= TRABAJOS_COLA_POR_USUARIO:
+        raise ColaLlena("Tienes demasiados trabajos en cola.")
+
+
+def _siguiente():
+    """Toma el siguiente trabajo por turnos entre usuarios que no llegaron a su tope (bajo _lock)."""
+    for _ in range(len(_turnos)):
+        user_id = _turnos.popleft()
+        cola = _pendientes.get(user_id)
+        if not cola:
+            _pendientes.pop(user_id, None)
+            continue
+        if _en_proceso.get(user_id, 0) >= TRABAJOS_POR_USUARIO:
+            _turnos.append(user_id)
+            continue
+        trabajo = cola.popleft()
+        if cola:
+            _turnos.append(user_id)
+        else:
+            del _pendientes[user_id]
+        return trabajo
+    return None
+
+
+def _despachar():
+    lanzados = []
+    with _lock:
+        while sum(_en_proceso.values()) < TRABAJOS_CONCURRENCIA:
+            trabajo = _siguiente()
+            if trabajo is None:
+                break
+            trabajo.estado = PROCESANDO
+            _en_proceso[trabajo.user_id] = _en_proceso.get(trabajo.user_id, 0) + 1
+            lanzados.append(trabajo)
+
+    for trabajo in lanzados:
+        _avisar(trabajo, 'trabajo_progreso')
+        tarea, trabajo.tarea = trabajo.tarea, None
+        try:
+            futuro = lotes.enviar(lotes.enmarcar_archivo, tarea)
+        except Exception as e:
+            futuro = Future()
+            futuro.set_exception(e)
+        futuro.add_done_callback(lambda futuro, trabajo=trabajo: _terminar(trabajo, futuro))
+
+
+def _terminar(trabajo, futuro):
+    try:
+        _, success, message, datos = lotes.resultado_con_metricas(futuro.result())
+        if success:
+            os.makedirs(TRABAJOS_DIR, exist_ok=True)
+            with open(trabajo.ruta_resultado, 'wb') as archivo:
+                archivo.write(datos)
+            trabajo.estado = TERMINADO
+        else:
+            trabajo.estado = ERROR
+        trabajo.mensaje = message
+    except lotes.BrokenProcessPool:
+        trabajo.estado = ERROR
+        trabajo.mensaje = "El proceso que enmarcaba el acta terminó inesperadamente."
+    except Exception as e:
+        trabajo.estado = ERROR
+        trabajo.mensaje = f"Error al generar el PDF: {e}"
+    trabajo.terminado = time.time()
+    _borrar(trabajo.ruta_carga)
+    _guardar_estado(trabajo)
+
+    with _lock:
+        _en_proceso[trabajo.user_id] -= 1
+        if _en_proceso[trabajo.user_id] <= 0:
+            del _en_proceso[trabajo.user_id]
+    _avisar(trabajo, 'trabajo_terminado' if trabajo.estado == TERMINADO else 'trabajo_error')
+    _despachar()
+
+
+def _guardar_estado(trabajo):
+    """Escribe el estado final junto al resultado para que cualquier worker pueda consultarlo."""
+    try:
+        os.makedirs(TRABAJOS_DIR, exist_ok=True)
+        with open(os.path.join(TRABAJOS_DIR, f"{trabajo.id}.json"), 'w') as archivo:
+            json.dump(trabajo.a_dict(), archivo)
+    except OSError as e:
+        print(f"No se pudo guardar el estado del trabajo {trabajo.id}: {e}")
+
+
+def consultar(trabajo_id):
+    """Estado del trabajo como dict, o None si no existe (busca también en TRABAJOS_DIR)."""
+    trabajo = _trabajos.get(trabajo_id)
+    if trabajo is not None:
+        estado = trabajo.a_dict()
+        if trabajo.estado == EN_COLA:
+            with _lock:
+                cola = _pendientes.get(trabajo.user_id, ())
+                estado["posicion"] = next((i for i, t in enumerate(cola) if t is trabajo), 0)
+        return estado
+    if not all(c in "0123456789abcdef" for c in trabajo_id):
+        return None
+    try:
+        with open(os.path.join(TRABAJOS_DIR, f"{trabajo_id}.json")) as archivo:
+            return json.load(archivo)
+    except (OSError, ValueError):
+        return None
+
+
+def ruta_resultado(trabajo_id):
+    """Ruta del PDF terminado del trabajo."""
+    return os.path.join(TRABAJOS_DIR, f"{trabajo_id}.pdf")
+
+
+def estadisticas():
+    """Profundidad de la cola y trabajos en proceso."""
+    with _lock:
+        return {
+            "en_cola": _en_cola_total(),
+            "en_proceso": sum(_en_proceso.values()),
+            "usuarios_en_cola": len(_pendientes),
+            "concurrencia": TRABAJOS_CONCURRENCIA,
+        }
+
+
+def _borrar(ruta):
+    try:
+        os.remove(ruta)
+    except OSError:
+        pass
+
+
+def _purgar_vencidos():
+    """Olvida los trabajos terminados hace más de TRABAJOS_RETENCION segundos y barre TRABAJOS_DIR.
+
+    El barrido (a lo más cada TRABAJOS_BARRIDO segundos) borra por fecha de
+    modificación los archivos vencidos de cualquier proceso, salvo las cargas de
+    los trabajos de este proceso que siguen en cola o en proceso.
+    """
+    global _barrido
+    ahora = time.time()
+    limite = ahora - TRABAJOS_RETENCION
+    with _lock:
+        vencidos = [t for t in _trabajos.values() if t.terminado is not None and t.terminado < limite]
+        for trabajo in vencidos:
+            del _trabajos[trabajo.id]
+        if ahora - _barrido < TRABAJOS_BARRIDO:
+            return
+        _barrido = ahora
+        vigentes = {f"{t.id}.carga" for t in _trabajos.values() if t.terminado is None}
+    try:
+        entradas = list(os.scandir(TRABAJOS_DIR))
+    except OSError:
+        return
+    for entrada in entradas:
+        if entrada.name in vigentes or not entrada.name.endswith((".pdf", ".json", ".carga")):
+            continue
+        try:
+            if entrada.stat().st_mtime < limite:
+                _borrar(entrada.path)
+        except OSError:
+            pass
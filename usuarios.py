@@ -0,0 +1,76 @@
+# Listado de usuarios del CRUD de administración.
+# Paginación por llave (keyset): las páginas van en orden de nombre_usuario, que
+# es único, y cada una pide las filas posteriores (o anteriores) al último nombre
+# mostrado en lugar de usar OFFSET. Con los índices de migraciones/002_usuarios.sql
+# (nombre_usuario; rol, nombre_usuario; activo, nombre_usuario) cualquier página,
+# con o sin filtros, lee solo sus filas: el costo no crece con el número de usuarios
+# ni con la profundidad de la página.
+
+USUARIOS_POR_PAGINA = 50
+ROLES = ("cliente", "admin")
+COLUMNAS_LISTADO = "id, nombre_usuario, rol, activo"
+
+
+def leer_filtros(args):
+    """Filtros del listado desde la consulta: búsqueda por nombre, rol y activo ('1'/'0')."""
+    busqueda = args.get('q', '').strip()
+    rol = args.get('rol', '')
+    activo = args.get('activo', '')
+    return {
+        "q": busqueda,
+        "rol": rol if rol in ROLES else '',
+        "activo": activo if activo in ('1', '0') else '',
+    }
+
+
+def _escapar_like(texto):
+    return texto.replace('!', '!!').replace('%', '!%').replace('_', '!_')
+
+
+def consulta_pagina(filtros, despues=None, antes=None, por_pagina=USUARIOS_POR_PAGINA):
+    """SQL y parámetros de una página (con una fila de más para saber si sigue otra).
+
+    La búsqueda por nombre es por prefijo, para que use el índice.
+    """
+    condiciones, parametros = [], []
+    if filtros["q"]:
+        condiciones.append("nombre_usuario LIKE %s ESCAPE '!'")
+        parametros.append(_escapar_like(filtros["q"]) + '%')
+    if filtros["rol"]:
+        condiciones.append("rol = %s")
+        parametros.append(filtros["rol"])
+    if filtros["activo"]:
+        condiciones.append("activo = %s")
+        parametros.append(int(filtros["activo"]))
+    if antes is not None:
+        condiciones.append("nombre_usuario < %s")
+        parametros.append(antes)
+    elif despues is not None:
+        condiciones.append("nombre_usuario > %s")
+        parametros.append(despues)
+
+    sql = (
+        f"SELECT {COLUMNAS_LISTADO} FROM usuarios"
+        + (" WHERE " + " AND ".join(condiciones) if condiciones else "")
+        + f" ORDER BY nombre_usuario {'DESC' if antes is not None else 'ASC'} LIMIT %s"
+    )
+    return sql, (*parametros, por_pagina + 1)
+
+
+def pagina_usuarios(cursor, filtros, despues=None, antes=None, por_pagina=USUARIOS_POR_PAGINA):
+    """Una página del listado: (filas, hay_anterior, hay_siguiente).
+
+    `despues` / `antes` son el último / primer nombre de la página desde la que se
+    navega; sin ninguno se devuelve la primera página, igual que si antes de
+    `antes` ya no hay nadie (un enlace viejo o editado a mano).
+    """
+    cursor.execute(*consulta_pagina(filtros, despues, antes, por_pagina))
+    filas = cursor.fetchall()
+    hay_mas = len(filas) > por_pagina
+    filas = filas[:por_pagina]
+    if antes is not None and not filas:
+        return pagina_usuarios(cursor, filtros, por_pagina=por_pagina)
+    if antes is not None:
+        filas.reverse()
+        return filas, hay_mas, True
+    return filas, despues is not None, hay_mas